@@ -0,0 +1,141 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from question_bank import QuestionBank
+
+# 默认内存预算（字节）
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 估算题目记录内存时抽样的题目数
+_SAMPLE_SIZE = 256
+
+
+def _record_bytes(question):
+    """单道题目记录及其字段值占用的内存（驻留字符串按各自计算，结果略偏大）"""
+    size = sys.getsizeof(question)
+    for field in ('content', 'analysis', 'answer_key', 'fingerprint', 'extra'):
+        value = getattr(question, field, None)
+        if value is not None:
+            size += sys.getsizeof(value)
+    for field in ('options', 'correct_answer'):
+        value = getattr(question, field, None)
+        if value:
+            size += sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+def estimate_bank_bytes(bank):
+    """估算已加载题库（题目记录、题型索引和已构建的搜索索引）占用的内存
+    
+    题目记录按抽样的平均大小乘以题目数估算，题型索引和搜索索引按数组实际大小计算。
+    """
+    questions = bank.questions
+    total = sys.getsizeof(questions)
+    if questions:
+        step = max(1, len(questions) // _SAMPLE_SIZE)
+        sample = [questions[i] for i in range(0, len(questions), step)]
+        total += sum(_record_bytes(q) for q in sample) * len(questions) // len(sample)
+    
+    total += sum(sys.getsizeof(bucket) for bucket in bank.type_index.values())
+    
+    # 搜索索引在首次搜索时才构建，尚未构建时不计入
+    if bank.has_search_index:
+        postings = bank.search_index.postings
+        total += sys.getsizeof(postings)
+        for token, (doc_ids, weights) in postings.items():
+            total += sys.getsizeof(token) + sys.getsizeof(doc_ids) + sys.getsizeof(weights) + 56
+    return total
+
+
+class BankCache:
+    """按文件路径缓存最近加载的题库（已规范化并建好索引），按内存预算淘汰最久未使用的题库
+    
+    缓存项在源文件的大小或修改时间变化后失效；超过预算时从最久未使用的一端淘汰，
+    单个超过预算的题库照常返回但不缓存。缓存后才构建了搜索索引的题库在下次命中时重新估算内存。
+    """
+    
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # 绝对路径 -> (题库, 估算字节数, 估算时是否已有搜索索引)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def get(self, file_path):
+        """返回仍然有效的缓存题库，未缓存或源文件已变化时返回None"""
+        key = os.path.abspath(file_path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and not entry[0].is_stale():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                if not entry[2] and entry[0].has_search_index:
+                    self._resize(key, entry[0])
+                return entry[0]
+            if entry is not None:
+                del self.entries[key]
+                self.total_bytes -= entry[1]
+            self.misses += 1
+            return None
+    
+    def put(self, file_path, bank):
+        """缓存题库，超过预算时淘汰最久未使用的题库"""
+        indexed = bank.has_search_index
+        size = estimate_bank_bytes(bank)
+        key = os.path.abspath(file_path)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (bank, size, indexed)
+            self.total_bytes += size
+            self._evict()
+    
+    def _resize(self, key, bank):
+        """题库构建了搜索索引后重新估算其内存（调用方需持有lock），超过预算时淘汰最久未使用的题库"""
+        size = estimate_bank_bytes(bank)
+        self.total_bytes += size - self.entries[key][1]
+        self.entries[key] = (bank, size, True)
+        self._evict()
+    
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            _, (_, evicted_size, _) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self.evictions += 1
+    
+    def load(self, file_path, on_progress=None):
+        """从缓存取得题库，未命中时加载并放入缓存"""
+        bank = self.get(file_path)
+        if bank is None:
+            bank = QuestionBank.load(file_path, on_progress=on_progress)
+            self.put(file_path, bank)
+        elif on_progress:
+            on_progress(len(bank), bank.stats)
+        return bank
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+    
+    def stats(self):
+        """缓存统计：命中/未命中次数、淘汰次数、缓存的题库数和估算占用的内存"""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes
+            }
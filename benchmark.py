@@ -0,0 +1,905 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试：生成合成题库和捕捉页面，测量题库加载、抽题、判分、搜索、
+HTML解析以及Web接口的耗时，结果以JSON格式输出，便于比较不同版本。
+
+用法示例：
+    python benchmark.py                              # 默认规模 1000,10000,100000
+    python benchmark.py --sizes 1000,1000000 --output bench.json
+    python benchmark.py --only load,extract --repeat 5
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import random
+import shutil
+import gzip
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import tracemalloc
+
+from question_bank import QuestionBank
+from grading import grade_session
+from weighted_sampling import QuestionHistory
+from search_index import SearchIndex
+from wire_format import decode_columnar, encode_columnar
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 默认题库规模、重复次数和随机种子
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 3
+DEFAULT_SEED = 42
+
+# 合成题库中各题型的占比（题型名称与parse_questions.py的输出一致，选择题加载时再区分单选/多选）
+TYPE_MIX = (
+    ('单选题', 0.35),
+    ('多选题', 0.15),
+    ('判断题', 0.20),
+    ('填空题', 0.20),
+    ('简答题', 0.08),
+    ('释义题', 0.02),
+)
+
+# 每次抽题的各题型数量
+EXTRACT_COUNTS = {'单选题': 20, '多选题': 10, '判断题': 10, '填空题': 10, '简答题': 5}
+
+# 大试卷（500题）的各题型数量，用于比较完整返回与精简返回的首题耗时和响应大小
+LARGE_PAPER_COUNTS = {'单选题': 200, '多选题': 100, '判断题': 100, '填空题': 100}
+# 模拟一次完整答题时的试卷（共100题）
+SESSION_PAPER_COUNTS = {'单选题': 40, '多选题': 20, '判断题': 20, '填空题': 20}
+
+# 合成文本使用的词汇，包含中英文，接近真实题库的分词情况
+_WORDS = ('计算机', '网络', '协议', '数据', '结构', '算法', '操作系统', '进程', '线程', '内存',
+          '数据库', '事务', '索引', '编译', '函数', '变量', 'TCP', 'HTTP', 'SQL', 'Python',
+          'Linux', '二叉树', '链表', '排序', '查找', '加密', '路由', '交换机', '文件', '接口')
+
+# 各基准测试项目，按执行顺序排列
+BENCHMARKS = ('load', 'extract', 'grade', 'search', 'parse', 'web', 'wire', 'answers', 'sessions', 'stress')
+
+
+def _sentence(rng, words):
+    return ''.join(rng.choice(_WORDS) for _ in range(words))
+
+
+def generate_question(rng, question_id):
+    """按TYPE_MIX的占比生成一道合成题目"""
+    roll = rng.random()
+    for q_type, share in TYPE_MIX:
+        roll -= share
+        if roll < 0:
+            break
+    
+    chapter = rng.randint(1, 40)
+    question = {
+        'id': question_id,
+        'title': f'第{chapter}章 {_WORDS[chapter % len(_WORDS)]}实训',
+        'content': f'{_sentence(rng, rng.randint(4, 12))}（{question_id}）',
+        'options': [],
+        'correct_answer': [],
+        'analysis': _sentence(rng, rng.randint(0, 8))
+    }
+    
+    if q_type in ('单选题', '多选题'):
+        options = [f'{letter} {_sentence(rng, rng.randint(1, 3))}' for letter in 'ABCD']
+        count = 1 if q_type == '单选题' else rng.randint(2, 4)
+        question['type'] = '选择题'
+        question['options'] = options
+        question['correct_answer'] = rng.sample(options, count)
+    elif q_type == '判断题':
+        question['type'] = q_type
+        question['options'] = ['正确', '错误']
+        question['correct_answer'] = [rng.choice(question['options'])]
+    else:
+        question['type'] = q_type
+        question['correct_answer'] = [_sentence(rng, rng.randint(1, 3)) for _ in range(rng.randint(1, 3))]
+    return question
+
+
+def write_bank(file_path, size, seed=DEFAULT_SEED):
+    """逐题写出合成题库，避免在内存中构造完整列表"""
+    rng = random.Random(seed)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        for i in range(size):
+            if i:
+                f.write(',\n')
+            f.write(json.dumps(generate_question(rng, i + 1), ensure_ascii=False))
+        f.write('\n]')
+
+
+def generate_capture_page(rng, page_no, questions_per_page):
+    """生成一个与头歌平台作答页面结构一致的HTML捕捉页面"""
+    items = []
+    for i in range(questions_per_page):
+        kind = rng.choice(('single', 'multi', 'judge', 'fill', 'short'))
+        content = f'{_sentence(rng, rng.randint(4, 10))} &amp; {page_no}-{i}'
+        if kind in ('single', 'multi'):
+            input_type = 'radio' if kind == 'single' else 'checkbox'
+            checked = {0} if kind == 'single' else {0, 2}
+            options = ''.join(
+                f'<a class="flex-container"><input type="{input_type}" {"checked" if j in checked else ""}>'
+                f'<span class="checkTitle">{"ABCD"[j]}</span>'
+                f'<div class="subject-body"> {_sentence(rng, 2)} </div></a>'
+                for j in range(4)
+            )
+            items.append(f'<li><div class="subject"><div class="subject-body">{content}</div></div>'
+                         f'<div class="option">{options}</div></li>')
+        elif kind == 'judge':
+            items.append(f'<li><div><div class="subject"><div class="subject-body">{content}</div></div>'
+                         '<div class="ant-radio-group">'
+                         '<label class="ant-radio-wrapper ant-radio-wrapper-checked"><span class="ant-radio-label">正确</span></label>'
+                         '<label class="ant-radio-wrapper"><span class="ant-radio-label">错误</span></label>'
+                         '</div></div></li>')
+        else:
+            rows = 'rows="4"' if kind == 'short' else ''
+            items.append(f'<li><div class="subject"><div class="subject-body">{content}</div></div>'
+                         f'<div class="option"><textarea {rows}>{_sentence(rng, 2)}；{_sentence(rng, 1)}</textarea></div></li>')
+    return (f'<html><head><title>实训{page_no % 5}</title></head>'
+            f'<body><ul>{"".join(items)}</ul></body></html>')
+
+
+def write_capture_pages(directory, pages, questions_per_page=20, seed=DEFAULT_SEED):
+    """在directory下生成pages个捕捉页面，返回文件路径列表"""
+    rng = random.Random(seed)
+    paths = []
+    for page_no in range(pages):
+        path = os.path.join(directory, f'page_{page_no:04d}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(generate_capture_page(rng, page_no, questions_per_page))
+        paths.append(path)
+    return paths
+
+
+# 比较解析引擎速度时使用的大页面的题目数
+LARGE_PAGE_QUESTIONS = 1000
+
+# 解析引擎一致性检查用的边界页面：名称 -> (HTML, lxml引擎是否应改用BeautifulSoup解析)
+_CHOICE = ('<a class="flex-container"><input type="radio" {checked}><span class="checkTitle">{label}</span>'
+           '<div class="subject-body">{text}</div></a>')
+EDGE_CASE_PAGES = {
+    'formatted_whitespace': ('''<!DOCTYPE html>
+<html>
+  <head><title> 实训&amp;测验 </title></head>
+  <body>
+    <ul>
+      <li>
+        <div class="subject">
+          <div class="subject-body">
+            第一行<br>
+            <span>第二行</span> <b>加粗</b>&nbsp;<i>斜体</i>
+            <!-- 注释不计入题干 -->
+            <script>var html = '<div class="subject">';</script>
+            <style>.a > .b { color: red }</style>
+            &lt;实体&gt; &#x4e2d;&#25991;　全角空格
+          </div>
+        </div>
+        <div class="option  other">
+          <a class="flex-container
+                    item">
+            <input type="checkbox" checked=""> <span class="checkTitle"> A </span>
+            <div class="subject-body">
+              选项一
+            </div>
+          </a>
+          <a class="flex-container"><input type="checkbox"><span class="checkTitle">B</span><div class="subject-body">选项二</div></a>
+          <a class="flex-container"><input type="checkbox" checked><span class="checkTitle">C</span><div class="subject-body">选项三</div></a>
+        </div>
+      </li>
+    </ul>
+  </body>
+</html>
+''', False),
+    'textarea_variants': (
+        '<html><head><title>填空</title></head><body>'
+        '<div><div class="subject"><div class="subject-body">解释下列名词</div></div>'
+        '<div class="option"><textarea style="height: 80px">答案一；答案二, 答案三</textarea></div></div>'
+        '<div class="subject"><div class="subject-body">填空</div></div>'
+        '<div class="option"><textarea rows="abc">\n  首行换行  </textarea></div>'
+        '<div class="subject"><div class="subject-body">什么是进程</div></div>'
+        '<div class="option"><textarea rows>  </textarea></div>'
+        '<div class="subject"><div class="subject-body">简述</div></div>'
+        '<div class="option"><textarea rows="3"></textarea></div>'
+        '<div class="subject"><div class="subject-body">高度</div></div>'
+        '<div class="option"><textarea style="height:30px">&lt;a&gt; &amp; b</textarea></div>'
+        '<div class="subject"><div class="subject-body">没有选项</div></div>'
+        '</body></html>', False),
+    'hidden_text': (
+        '<html><body><ul><li><div class="subject"><div class="subject-body">'
+        '<ruby>汉<rp>(</rp><rt>han</rt><rp>)</rp></ruby>字<template><span>模板</span></template>'
+        '<pre>\n  保留  空白\n</pre> <span>\n</span> <span> </span>'
+        '</div></div><div class="ant-radio-group">'
+        '<label class="ant-radio-wrapper"><span class="ant-radio-label"> 正确 </span></label>'
+        '<label class="ant-radio-wrapper\tant-radio-wrapper-checked"><span class="ant-radio-label">错误</span></label>'
+        '</div></li></ul></body></html>', False),
+    'explicit_checked': (
+        '<html><body><li><div class="subject"><div class="subject-body">题</div></div><div class="option">'
+        + _CHOICE.format(checked='checked="checked"', label='A', text='一')
+        + _CHOICE.format(checked='checked', label='B', text='二')
+        + '</div></li></body></html>', True),
+    'markup_in_textarea': (
+        '<html><body><li><div class="subject"><div class="subject-body">题</div></div>'
+        '<div class="option"><textarea><b>答案</b></textarea></div></li></body></html>', True),
+    'misnested_tags': (
+        '<html><body><li><p><div class="subject"><div class="subject-body">题</div></div></p>'
+        '<div class="option">' + _CHOICE.format(checked='', label='A', text='一') + '</div></li></body></html>', True),
+}
+
+
+def write_edge_case_pages(directory):
+    """在directory下生成EDGE_CASE_PAGES中的页面，返回(文件路径列表, 应改用BeautifulSoup解析的文件路径集合)"""
+    paths = []
+    expected_fallback = set()
+    for name, (html, fallback) in EDGE_CASE_PAGES.items():
+        path = os.path.join(directory, f'edge_{name}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        paths.append(path)
+        if fallback:
+            expected_fallback.add(path)
+    return paths, expected_fallback
+
+
+def measure(fn, repeat, setup=None):
+    """重复执行fn，返回耗时统计（秒）以及最后一次的返回值"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    stats = {
+        'min': round(min(timings), 6),
+        'median': round(statistics.median(timings), 6),
+        'mean': round(statistics.mean(timings), 6),
+        'repeat': repeat
+    }
+    return stats, result
+
+
+def measure_peak_memory(fn):
+    """测量fn执行期间Python分配的内存峰值（字节）"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _remove_cache(bank_path):
+    try:
+        os.remove(bank_path + '.cache')
+    except FileNotFoundError:
+        pass
+
+
+def _import_web_server(workdir):
+    """导入web_server：导入前把日志和错题本目录指向临时目录，做题记录也写入临时目录，不影响项目中真实的数据"""
+    os.environ['LOG_DIR'] = os.path.join(workdir, 'logs')
+    os.environ['WRONG_QUESTIONS_DIR'] = os.path.join(workdir, 'wrong_questions')
+    import web_server
+    web_server.safe_manager.history = QuestionHistory(os.path.join(workdir, 'history.json'), save_delay=None)
+    return web_server
+
+
+def _make_manager(workdir):
+    """创建独立的题库管理器，做题记录写入临时目录，不影响真实的做题记录"""
+    manager = _import_web_server(workdir).SafeQuestionManager()
+    manager.history = QuestionHistory(os.path.join(workdir, 'history.json'), save_delay=None)
+    # 搜索索引在首次搜索时构建，后台构建会干扰加载等其他测量
+    manager.background_search_index = False
+    return manager
+
+
+def _make_answers(questions, rng, correct_ratio=0.5):
+    """为试卷生成作答：约correct_ratio比例答对，其余答错"""
+    answers = {}
+    for i, question in enumerate(questions):
+        correct = list(question.get('correct_answer') or [])
+        if rng.random() < correct_ratio:
+            answers[i] = correct
+        else:
+            answers[i] = ['错误答案'] * max(1, len(correct))
+    return answers
+
+
+def bench_load(context):
+    """题库加载：无缓存的冷加载、命中旁路缓存的热加载、命中内存缓存的切换，以及加载峰值内存"""
+    bank_path, repeat = context['bank_path'], context['repeat']
+    manager = _make_manager(context['workdir'])
+    relative_path = os.path.relpath(bank_path, BASE_DIR)
+    
+    def clear_caches():
+        _remove_cache(bank_path)
+        manager.bank_cache.clear()
+    
+    cold, _ = measure(lambda: manager.load_questions(relative_path), repeat, setup=clear_caches)
+    warm, _ = measure(lambda: manager.load_questions(relative_path), repeat, setup=manager.bank_cache.clear)
+    memory_hit, _ = measure(lambda: manager.load_questions(relative_path), repeat * 10)
+    bank_only, _ = measure(lambda: QuestionBank.load(bank_path), repeat)
+    _remove_cache(bank_path)
+    peak_cold = measure_peak_memory(lambda: QuestionBank.load(bank_path, use_cache=False))
+    peak_warm = measure_peak_memory(lambda: QuestionBank.load(bank_path))
+    return {
+        'load_questions_cold': cold,
+        'load_questions_warm': warm,
+        'load_questions_memory_hit': memory_hit,
+        'question_bank_load_warm': bank_only,
+        'peak_memory_cold_bytes': peak_cold,
+        'peak_memory_warm_bytes': peak_warm,
+        'bank_cache': manager.bank_cache.stats()
+    }
+
+
+def _loaded_manager(context):
+    manager = context.get('manager')
+    if manager is None:
+        manager = _make_manager(context['workdir'])
+        manager.load_questions(os.path.relpath(context['bank_path'], BASE_DIR))
+        context['manager'] = manager
+    return manager
+
+
+def bench_extract(context):
+    """抽题：等概率抽取以及按答错次数加权抽取"""
+    manager, repeat = _loaded_manager(context), context['repeat'] * 10
+    uniform, paper = measure(lambda: manager._extract_by_counts(EXTRACT_COUNTS), repeat)
+    weighted, _ = measure(lambda: manager._extract_by_counts(EXTRACT_COUNTS, 'wrong'), repeat)
+    return {
+        'extract_uniform': uniform,
+        'extract_weighted_wrong': weighted,
+        'paper_size': len(paper)
+    }
+
+
+def bench_grade(context):
+    """判分：对一份试卷和一份大试卷（1000题或题库全部题目）批改"""
+    manager, repeat = _loaded_manager(context), context['repeat'] * 10
+    rng = random.Random(context['seed'])
+    paper = manager._extract_by_counts(EXTRACT_COUNTS)
+    answers = _make_answers(paper, rng)
+    paper_stats, result = measure(lambda: grade_session(paper, answers), repeat)
+    
+    large_paper = [manager.questions[i] for i in rng.sample(range(len(manager.questions)),
+                                                             min(1000, len(manager.questions)))]
+    large_answers = _make_answers(large_paper, rng)
+    large_stats, _ = measure(lambda: grade_session(large_paper, large_answers), context['repeat'])
+    return {
+        'grade_paper': paper_stats,
+        'grade_1000': large_stats,
+        'paper_score': result.score
+    }
+
+
+def bench_search(context):
+    """全文搜索：构建索引以及常见查询的耗时"""
+    manager, repeat = _loaded_manager(context), context['repeat']
+    build, _ = measure(lambda: SearchIndex(manager.questions), repeat)
+    results = {'search_index_build': build}
+    manager.snapshot.search_index  # 先构建题库自身的索引，下面只测量查询
+    for name, query in (('cjk_phrase', '操作系统进程'), ('ascii_word', 'tcp'),
+                        ('single_char', '树'), ('prefix', 'pyth')):
+        stats, result = measure(lambda: manager.search_questions(query), repeat * 10)
+        stats['total_hits'] = result.total
+        results[f'search_{name}'] = stats
+    return results
+
+
+def bench_parse(context):
+    """HTML解析：解析生成的捕捉页面并去重，比较lxml引擎与BeautifulSoup的速度和解析结果"""
+    try:
+        from parse_questions import (parse_html_files, parse_html_to_json, deduplicate_questions,
+                                     check_engine_parity, LXML_AVAILABLE)
+    except ImportError as e:
+        return {'skipped': f'缺少依赖: {e}'}
+    
+    pages = context['page_paths']
+    parsed = []
+    
+    def parse_all():
+        parsed[:] = []
+        for path in pages:
+            parsed.extend(parse_html_to_json(path))
+        return parsed
+    
+    parse_stats, _ = measure(parse_all, context['repeat'])
+    workers = os.cpu_count() or 1
+    parallel_stats, per_file = measure(lambda: parse_html_files(pages, workers=0), context['repeat'])
+    if [q for questions in per_file for q in questions] != parsed:
+        raise RuntimeError('并行解析的结果与逐个解析不一致')
+    dedup_stats, (unique, _) = measure(lambda: deduplicate_questions(list(parsed)), context['repeat'])
+    results = {
+        'parse_html_to_json': parse_stats,
+        'parse_parallel': parallel_stats,
+        'parse_workers': workers,
+        'deduplicate_questions': dedup_stats,
+        'pages': len(pages),
+        'questions_parsed': len(parsed),
+        'questions_unique': len(unique)
+    }
+    if not LXML_AVAILABLE:
+        results['lxml'] = {'skipped': '缺少依赖: lxml'}
+        return results
+    
+    lxml_stats, lxml_parsed = measure(
+        lambda: [q for path in pages for q in parse_html_to_json(path, engine='lxml')], context['repeat'])
+    if lxml_parsed != parsed:
+        raise RuntimeError('lxml引擎的解析结果与BeautifulSoup不一致')
+    
+    # 单个大页面上两种引擎的耗时
+    large_page = os.path.join(context['workdir'], 'large_page.html')
+    with open(large_page, 'w', encoding='utf-8') as f:
+        f.write(generate_capture_page(random.Random(context['seed']), 0, LARGE_PAGE_QUESTIONS))
+    large_bs4_stats, large_bs4 = measure(lambda: parse_html_to_json(large_page, engine='bs4'), context['repeat'])
+    large_lxml_stats, large_lxml = measure(lambda: parse_html_to_json(large_page, engine='lxml'), context['repeat'])
+    if large_lxml != large_bs4:
+        raise RuntimeError('lxml引擎对大页面的解析结果与BeautifulSoup不一致')
+    
+    # 在生成的页面和边界页面上逐页比较两种引擎的结果
+    edge_dir = os.path.join(context['workdir'], 'edge_cases')
+    os.makedirs(edge_dir, exist_ok=True)
+    edge_paths, expected_fallback = write_edge_case_pages(edge_dir)
+    parity = check_engine_parity(pages + [large_page] + edge_paths)
+    if parity['mismatched']:
+        raise RuntimeError(f"lxml引擎的解析结果与BeautifulSoup不一致: {parity['mismatched']}")
+    if set(parity['fallback']) != expected_fallback:
+        raise RuntimeError(f"改用BeautifulSoup解析的页面与预期不符: {parity['fallback']}")
+    
+    results['lxml'] = {
+        'parse_html_to_json': lxml_stats,
+        'speedup': round(parse_stats['median'] / lxml_stats['median'], 2),
+        'large_page_questions': LARGE_PAGE_QUESTIONS,
+        'large_page_bytes': os.path.getsize(large_page),
+        'large_page_bs4': large_bs4_stats,
+        'large_page_lxml': large_lxml_stats,
+        'large_page_speedup': round(large_bs4_stats['median'] / large_lxml_stats['median'], 2),
+        'parity_pages': parity['pages'],
+        'parity_identical': parity['identical'],
+        'parity_fallback': len(parity['fallback'])
+    }
+    return results
+
+
+def bench_web(context):
+    """Web接口：通过Flask测试客户端调用加载、抽题、作答、提交和搜索接口"""
+    try:
+        web_server = _import_web_server(context['workdir'])
+    except ImportError as e:
+        return {'skipped': f'缺少依赖: {e}'}
+    
+    repeat = context['repeat']
+    client = web_server.app.test_client()
+    relative_path = os.path.relpath(context['bank_path'], BASE_DIR)
+    rng = random.Random(context['seed'])
+    
+    def post(url, payload):
+        response = client.post(url, json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} 返回 {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        return response
+    
+    def get(url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} 返回 {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        return response
+    
+    results = {}
+    results['api_load_questions'], _ = measure(
+        lambda: post('/api/load_questions', {'file_path': relative_path}), repeat)
+    results['api_extract_questions'], response = measure(
+        lambda: post('/api/extract_questions', {'type_ratios': EXTRACT_COUNTS}), repeat * 5)
+    questions = response.get_json()['questions']
+    answers = _make_answers(questions, rng)
+    
+    def answer_all():
+        for i, answer in answers.items():
+            post(f'/api/questions/{i}/answer', {'answer': answer})
+    
+    results['api_answer_paper'], _ = measure(answer_all, repeat)
+    results['api_get_question'], _ = measure(lambda: get('/api/questions/0'), repeat * 10)
+    results['api_submit'], _ = measure(lambda: post('/api/submit', {}), repeat * 5)
+    results['api_search'], _ = measure(lambda: get('/api/search?q=%E7%BD%91%E7%BB%9C'), repeat * 5)
+    
+    # 大试卷：完整返回全部题目 与 精简返回答题卡骨架后再获取第一个窗口，比较首题耗时和响应大小
+    stats = post('/api/load_questions', {'file_path': relative_path}).get_json()['stats']
+    large_counts = {q_type: min(count, stats.get(q_type, 0)) for q_type, count in LARGE_PAPER_COUNTS.items()}
+    results['first_question_full'], full = measure(
+        lambda: post('/api/extract_questions', {'type_ratios': large_counts}), repeat * 5)
+    
+    def lean_first_question():
+        sheet = post('/api/extract_questions', {'type_ratios': large_counts, 'lean': True})
+        return sheet, get('/api/questions?start=0&count=20')
+    
+    results['first_question_lean'], (sheet, window) = measure(lean_first_question, repeat * 5)
+    results['large_paper_size'] = full.get_json()['questions_count']
+    results['full_payload_bytes'] = len(full.get_data())
+    results['lean_payload_bytes'] = len(sheet.get_data()) + len(window.get_data())
+    return results
+
+
+def bench_wire(context):
+    """题目列表的传输格式：比较大试卷按普通JSON和按列编码时的响应大小（原始/gzip）与编解码耗时"""
+    manager, repeat = _loaded_manager(context), context['repeat'] * 5
+    stats = manager.get_stats()
+    large_counts = {q_type: min(count, stats.get(q_type, 0)) for q_type, count in LARGE_PAPER_COUNTS.items()}
+    records = [q.to_dict() for q in manager._extract_by_counts(large_counts)]
+    columnar = encode_columnar(records)
+    if decode_columnar(columnar) != records:
+        raise RuntimeError('按列编码解码后与原始题目不一致')
+    
+    def dump(payload):
+        return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    
+    json_bytes, columnar_bytes = dump(records), dump(columnar)
+    json_encode, _ = measure(lambda: dump(records), repeat)
+    columnar_encode, _ = measure(lambda: dump(encode_columnar(records)), repeat)
+    json_decode, _ = measure(lambda: json.loads(json_bytes), repeat)
+    columnar_decode, _ = measure(lambda: decode_columnar(json.loads(columnar_bytes)), repeat)
+    return {
+        'paper_size': len(records),
+        'json_bytes': len(json_bytes),
+        'columnar_bytes': len(columnar_bytes),
+        'json_gzip_bytes': len(gzip.compress(json_bytes)),
+        'columnar_gzip_bytes': len(gzip.compress(columnar_bytes)),
+        'json_encode': json_encode,
+        'columnar_encode': columnar_encode,
+        'json_decode': json_decode,
+        'columnar_decode': columnar_decode
+    }
+
+
+def _answer_events(questions, answers, rng):
+    """模拟考生作答时前端产生的答案变化：选择题点击1~3次，填空题逐字输入"""
+    events = []
+    for i, question in enumerate(questions):
+        answer = answers[i]
+        if question['type'] == '填空题':
+            text = ''.join(answer)
+            events.extend((i, [text[:n]]) for n in range(1, len(text) + 1))
+        else:
+            for _ in range(rng.randint(0, 2)):
+                events.append((i, [rng.choice(question.get('options') or ['A'])]))
+        events.append((i, answer))
+    return events
+
+
+def bench_answers(context):
+    """一次完整答题（100题）的作答保存：每次变化单独保存 与 按题批量保存（切换题目时提交），比较请求数和服务器CPU时间"""
+    try:
+        web_server = _import_web_server(context['workdir'])
+    except ImportError as e:
+        return {'skipped': f'缺少依赖: {e}'}
+    
+    relative_path = os.path.relpath(context['bank_path'], BASE_DIR)
+    client = web_server.app.test_client()
+    stats = client.post('/api/load_questions', json={'file_path': relative_path}).get_json()['stats']
+    counts = {q_type: min(count, stats.get(q_type, 0)) for q_type, count in SESSION_PAPER_COUNTS.items()}
+    rng = random.Random(context['seed'])
+    paper = client.post('/api/extract_questions', json={'type_ratios': counts}).get_json()
+    questions, paper_id = paper['questions'], paper['paper_id']
+    events = _answer_events(questions, _make_answers(questions, rng), rng)
+    
+    def run(save_events):
+        start_cpu, start = time.process_time(), time.perf_counter()
+        requests_sent = save_events()
+        elapsed_cpu, elapsed = time.process_time() - start_cpu, time.perf_counter() - start
+        return {
+            'answer_changes': len(events),
+            'requests': requests_sent,
+            'cpu_seconds': round(elapsed_cpu, 6),
+            'wall_seconds': round(elapsed, 6),
+            'score': client.post('/api/submit', json={}).get_json()['score']
+        }
+    
+    def save_each():
+        for index, answer in events:
+            client.post(f'/api/questions/{index}/answer', json={'answer': answer})
+        return len(events)
+    
+    def save_batched():
+        # 版本号1用于清空逐次保存的答案
+        requests_sent, version, batch = 0, 1, {}
+        for n, (index, answer) in enumerate(events):
+            batch[str(index)] = answer
+            if n + 1 == len(events) or events[n + 1][0] != index:
+                version += 1
+                client.post('/api/answers', json={'answers': batch, 'version': version, 'paper_id': paper_id})
+                requests_sent += 1
+                batch = {}
+        return requests_sent
+    
+    per_answer = run(save_each)
+    client.post('/api/answers', json={'answers': {str(i): [] for i in range(len(questions))},
+                                      'version': 1, 'paper_id': paper_id})
+    batched = run(save_batched)
+    if per_answer['score'] != batched['score']:
+        raise RuntimeError('批量保存与逐次保存的判分结果不一致')
+    return {'per_answer': per_answer, 'batched': batched}
+
+
+def bench_sessions(context):
+    """多名考生同时答题：每个测试客户端持有独立会话，测量抽题、作答、提交的耗时以及每个会话占用的内存"""
+    try:
+        web_server = _import_web_server(context['workdir'])
+    except ImportError as e:
+        return {'skipped': f'缺少依赖: {e}'}
+    
+    students = context['students']
+    relative_path = os.path.relpath(context['bank_path'], BASE_DIR)
+    web_server.app.test_client().post('/api/load_questions', json={'file_path': relative_path})
+    rng = random.Random(context['seed'])
+    clients = [web_server.app.test_client() for _ in range(students)]
+    
+    def extract_all():
+        papers = []
+        for client in clients:
+            response = client.post('/api/extract_questions', json={'type_ratios': EXTRACT_COUNTS})
+            papers.append(response.get_json()['questions'])
+        return papers
+    
+    sessions_before = len(web_server.session_store)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    papers = extract_all()
+    extract_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for client, paper in zip(clients, papers):
+        for i, answer in _make_answers(paper, rng).items():
+            client.post(f'/api/questions/{i}/answer', json={'answer': answer})
+    answer_seconds = time.perf_counter() - start
+    session_memory = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(True, '*session_store.py')]).statistics('filename')
+    tracemalloc.stop()
+    
+    start = time.perf_counter()
+    scores = [client.post('/api/submit', json={}).get_json()['score'] for client in clients]
+    submit_seconds = time.perf_counter() - start
+    
+    session_bytes = sum(stat.size for stat in session_memory)
+    return {
+        'students': students,
+        'sessions_created': len(web_server.session_store) - sessions_before,
+        'extract_all_seconds': round(extract_seconds, 6),
+        'answer_all_seconds': round(answer_seconds, 6),
+        'submit_all_seconds': round(submit_seconds, 6),
+        'session_store_bytes': session_bytes,
+        'bytes_per_session': session_bytes // max(1, students),
+        'mean_score': round(statistics.mean(scores), 1)
+    }
+
+
+def bench_stress(context):
+    """并发压力测试：多个线程反复加载两个不同的题库，同时多个考生不断抽题、作答、提交
+    
+    检查每份试卷的题目都来自同一个题库、每个快照的题目数与统计一致，且没有请求失败。
+    """
+    try:
+        web_server = _import_web_server(context['workdir'])
+    except ImportError as e:
+        return {'skipped': f'缺少依赖: {e}'}
+    
+    threads, iterations = context['threads'], context['iterations']
+    manager = web_server.safe_manager
+    
+    # 第二个题库使用不同的种子和规模，两个题库的题干互不相同
+    bank_a = context['bank_path']
+    bank_b = os.path.join(context['workdir'], 'stress_b.json')
+    write_bank(bank_b, max(100, len(QuestionBank.load(bank_a)) // 2), context['seed'] + 1)
+    contents = [frozenset(q['content'] for q in QuestionBank.load(path).questions) for path in (bank_a, bank_b)]
+    relative_paths = [os.path.relpath(path, BASE_DIR) for path in (bank_a, bank_b)]
+    manager.load_questions(relative_paths[0])
+    
+    type_counts = {'单选题': 5, '多选题': 3, '判断题': 5, '填空题': 5}
+    lock = threading.Lock()
+    counters = {'loads': 0, 'papers': 0, 'submits': 0, 'searches': 0,
+                'mixed_papers': 0, 'inconsistent_snapshots': 0}
+    errors = []
+    stop = threading.Event()
+    
+    def count(name):
+        with lock:
+            counters[name] += 1
+    
+    def fail(message):
+        with lock:
+            errors.append(message)
+    
+    def check_snapshot(snapshot):
+        questions = snapshot.questions
+        if sum(snapshot.stats.values()) != len(questions) or any(
+                bucket and bucket[-1] >= len(questions) for bucket in snapshot.type_index.values()):
+            count('inconsistent_snapshots')
+    
+    def loader():
+        turn = 0
+        while not stop.is_set():
+            try:
+                if not manager.load_questions(relative_paths[turn % 2]):
+                    fail('加载题库失败')
+                count('loads')
+                check_snapshot(manager.snapshot)
+            except Exception as e:
+                fail(f'加载题库异常: {e!r}')
+            turn += 1
+    
+    def student():
+        client = web_server.app.test_client()
+        for _ in range(iterations):
+            try:
+                response = client.post('/api/extract_questions', json={'type_ratios': type_counts})
+                if response.status_code != 200:
+                    fail(f'抽题返回 {response.status_code}')
+                    continue
+                paper = response.get_json()['questions']
+                paper_contents = {q['content'] for q in paper}
+                if not any(paper_contents <= bank_contents for bank_contents in contents):
+                    count('mixed_papers')
+                count('papers')
+                
+                for i, question in enumerate(paper):
+                    client.post(f'/api/questions/{i}/answer', json={'answer': question['correct_answer']})
+                result = client.post('/api/submit', json={}).get_json()
+                if not result.get('success') or result['total_questions'] != len(paper) or result['score'] != 100.0:
+                    fail(f'提交结果不一致: {result.get("message") or result.get("score")}')
+                count('submits')
+                
+                response = client.get('/api/search?q=%E7%BD%91%E7%BB%9C')
+                if response.status_code != 200:
+                    fail(f'搜索返回 {response.status_code}')
+                count('searches')
+                check_snapshot(manager.snapshot)
+            except Exception as e:
+                fail(f'答题异常: {e!r}')
+    
+    # 缩短线程切换间隔，尽量放大请求之间的交错
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    loaders = [threading.Thread(target=loader) for _ in range(2)]
+    students = [threading.Thread(target=student) for _ in range(threads)]
+    start = time.perf_counter()
+    try:
+        for thread in loaders + students:
+            thread.start()
+        for thread in students:
+            thread.join()
+    finally:
+        stop.set()
+        for thread in loaders:
+            thread.join()
+        sys.setswitchinterval(switch_interval)
+    elapsed = time.perf_counter() - start
+    
+    os.remove(bank_b)
+    _remove_cache(bank_b)
+    passed = not errors and counters['mixed_papers'] == 0 and counters['inconsistent_snapshots'] == 0
+    if not passed:
+        raise RuntimeError(f"并发压力测试未通过: 混合试卷{counters['mixed_papers']}份，"
+                           f"不一致的快照{counters['inconsistent_snapshots']}个，请求失败{len(errors)}次，"
+                           f"示例: {errors[:5]}")
+    return dict(counters, threads=threads, iterations=iterations, seconds=round(elapsed, 3),
+                errors=len(errors), error_samples=errors[:5], passed=passed)
+
+
+BENCHMARK_FUNCTIONS = {
+    'load': bench_load,
+    'extract': bench_extract,
+    'grade': bench_grade,
+    'search': bench_search,
+    'parse': bench_parse,
+    'web': bench_web,
+    'wire': bench_wire,
+    'answers': bench_answers,
+    'sessions': bench_sessions,
+    'stress': bench_stress,
+}
+
+
+def run_benchmarks(sizes, only=BENCHMARKS, repeat=DEFAULT_REPEAT, seed=DEFAULT_SEED,
+                   pages=20, questions_per_page=20, students=100, threads=16, iterations=20):
+    """按题库规模依次运行各基准测试，返回可序列化为JSON的结果"""
+    # 临时题库放在项目目录下的隐藏目录中，Web接口只允许加载项目目录内的文件
+    workdir = tempfile.mkdtemp(prefix='.benchmark_', dir=BASE_DIR)
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'seed': seed,
+        'repeat': repeat,
+        'results': []
+    }
+    try:
+        page_paths = []
+        if 'parse' in only:
+            page_dir = os.path.join(workdir, 'html')
+            os.makedirs(page_dir)
+            page_paths = write_capture_pages(page_dir, pages, questions_per_page, seed)
+        
+        for size in sizes:
+            bank_path = os.path.join(workdir, f'bank_{size}.json')
+            start = time.perf_counter()
+            write_bank(bank_path, size, seed)
+            print(f"生成 {size} 题的合成题库用时 {time.perf_counter() - start:.2f}s", file=sys.stderr)
+            
+            context = {
+                'bank_path': bank_path,
+                'workdir': workdir,
+                'repeat': repeat,
+                'seed': seed,
+                'page_paths': page_paths,
+                'students': students,
+                'threads': threads,
+                'iterations': iterations
+            }
+            entry = {'size': size, 'file_bytes': os.path.getsize(bank_path)}
+            for name in only:
+                if name == 'parse' and size != sizes[0]:
+                    # HTML解析与题库规模无关，只测一次
+                    continue
+                print(f"[{size}] {name} ...", file=sys.stderr)
+                entry[name] = BENCHMARK_FUNCTIONS[name](context)
+            report['results'].append(entry)
+            
+            os.remove(bank_path)
+            _remove_cache(bank_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TG Helper 性能基准测试')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='合成题库的题目数量，逗号分隔（如 1000,10000,1000000）')
+    parser.add_argument('--only', default=','.join(BENCHMARKS),
+                        help=f'只运行指定的测试项目，逗号分隔，可选：{",".join(BENCHMARKS)}')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每项测试的重复次数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='随机种子，相同种子生成相同的数据')
+    parser.add_argument('--pages', type=int, default=20, help='生成的捕捉页面数量')
+    parser.add_argument('--questions-per-page', type=int, default=20, help='每个捕捉页面的题目数量')
+    parser.add_argument('--students', type=int, default=100, help='多考生测试中同时答题的考生数')
+    parser.add_argument('--threads', type=int, default=16, help='并发压力测试中同时答题的线程数')
+    parser.add_argument('--iterations', type=int, default=20, help='并发压力测试中每个线程的答题轮数')
+    parser.add_argument('--output', help='结果JSON文件路径，默认输出到标准输出')
+    args = parser.parse_args(argv)
+    
+    args.sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    args.only = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = [name for name in args.only if name not in BENCHMARK_FUNCTIONS]
+    if unknown:
+        parser.error(f'未知的测试项目: {",".join(unknown)}')
+    if not args.sizes or min(args.sizes) <= 0 or args.repeat <= 0:
+        parser.error('题库规模和重复次数必须是正整数')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmarks(args.sizes, args.only, args.repeat, args.seed,
+                            args.pages, args.questions_per_page, args.students,
+                            args.threads, args.iterations)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"结果已保存到 {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
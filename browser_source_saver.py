@@ -308,15 +308,16 @@ class BrowserWindow(QMainWindow):
                 progress_dialog.setValue(progress)
                 progress_dialog.setLabelText(f"正在处理文件 {current}/{total}")
             
-            # 调用process_all_html_files函数生成题库
-            process_all_html_files()
+            # 调用process_all_html_files函数生成题库（只解析新增或变化的网页）
+            stats = process_all_html_files()
             
             # 完成后提示
             progress_dialog.setValue(100)
             QMessageBox.information(
                 self,
                 "生成成功",
-                f"已成功从 {len(html_files)} 个网页文件中生成题库\n\n" +
+                f"已成功从 {stats['files']} 个网页文件中生成题库，共 {stats['questions']} 道题目\n" +
+                f"（新解析 {stats['parsed']} 个，复用上次结果 {stats['reused']} 个）\n\n" +
                 "生成的题库文件已保存到当前目录的questions.json"
             )
         except Exception as e:
@@ -0,0 +1,62 @@
+from collections import namedtuple
+
+# 按选项集合判分的题型
+CHOICE_TYPES = frozenset(['单选题', '判断题', '多选题', '选择题'])
+# 按逐空去除首尾空格后比较判分的题型
+TEXT_TYPES = frozenset(['填空题', '简答题', '释义题'])
+
+# 批改结果：得分（满分100）、正确题数、总题数、答错题目在试卷中的下标
+GradeResult = namedtuple('GradeResult', ['score', 'correct_count', 'total_questions', 'wrong_indices'])
+
+
+def build_answer_key(q_type, correct_answer):
+    """预先计算标准化的答案键：选择类题型为frozenset，填空类题型为去除首尾空格的元组"""
+    if correct_answer is None:
+        correct_answer = ()
+    if q_type in CHOICE_TYPES:
+        return frozenset(correct_answer)
+    if q_type in TEXT_TYPES:
+        return tuple(answer.strip() if isinstance(answer, str) else answer for answer in correct_answer)
+    return None
+
+
+def answer_key_of(question):
+    """获取题目的答案键，优先使用加载时预先计算好的结果"""
+    key = getattr(question, 'answer_key', None)
+    if key is None:
+        key = build_answer_key(question.get('type'), question.get('correct_answer'))
+    return key
+
+
+def is_answer_correct(question, user_answer):
+    """判断单道题的作答是否正确"""
+    key = answer_key_of(question)
+    if not user_answer:
+        user_answer = ()
+    if isinstance(key, frozenset):
+        return frozenset(user_answer) == key
+    if isinstance(key, tuple):
+        return len(user_answer) == len(key) and all(
+            ua.strip() == ca for ua, ca in zip(user_answer, key)
+        )
+    return False
+
+
+def grade_session(questions, user_answers):
+    """一次遍历批改整份试卷，同时返回得分、正确题数和错题列表
+    
+    user_answers为题目下标到作答内容的映射，未作答的题目按空答案处理。
+    """
+    total_questions = len(questions)
+    correct_count = 0
+    wrong_indices = []
+    
+    for i, question in enumerate(questions):
+        if is_answer_correct(question, user_answers.get(i)):
+            correct_count += 1
+        else:
+            wrong_indices.append(i)
+    
+    # 计算得分（满分100）
+    score = round((correct_count / total_questions) * 100, 1) if total_questions > 0 else 0
+    return GradeResult(score, correct_count, total_questions, wrong_indices)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课堂规模的负载测试：模拟N名考生同时使用Web版答题，统计吞吐量、各接口的延迟分位数和错误率。
+
+每名模拟考生依次：加载题库、抽取试卷（精简模式）、按窗口获取题目、逐题作答（带思考时间，
+切换题目时批量保存答案）、提交试卷。可直接在进程内调用Flask测试客户端，也可以对本机运行中的服务器发起请求。
+
+用法示例：
+    python load_test.py --students 60                                # 进程内测试客户端，自动生成合成题库
+    python load_test.py --students 60 --bank questions.json --questions 100 --think-time 2
+    python load_test.py --url http://127.0.0.1:5000 --bank questions.json --students 200 --output load.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 每次获取的题目窗口大小（与web/app.js一致）
+QUESTION_WINDOW = 20
+
+# 试卷中各题型的占比
+PAPER_MIX = (('单选题', 0.4), ('多选题', 0.2), ('判断题', 0.2), ('填空题', 0.2))
+
+
+class TestClientTransport:
+    """进程内调用Flask测试客户端，每名考生一个客户端（各自保存会话Cookie）
+    
+    日志、错题本和做题记录都写入workdir，不影响项目中真实的数据。
+    """
+    
+    __test__ = False  # 不是pytest测试类
+    
+    def __init__(self, workdir):
+        os.environ['LOG_DIR'] = os.path.join(workdir, 'logs')
+        os.environ['WRONG_QUESTIONS_DIR'] = os.path.join(workdir, 'wrong_questions')
+        import web_server
+        from weighted_sampling import QuestionHistory
+        web_server.safe_manager.history = QuestionHistory(os.path.join(workdir, 'history.json'), save_delay=None)
+        self.app = web_server.app
+    
+    def client(self):
+        client = self.app.test_client()
+        
+        def request(method, url, payload=None):
+            response = client.open(url, method=method, json=payload)
+            return response.status_code, response.get_json(silent=True)
+        
+        return request
+
+
+class HttpTransport:
+    """通过HTTP请求运行中的服务器，每名考生一个requests会话"""
+    
+    def __init__(self, base_url, timeout=30):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+    
+    def client(self):
+        session = self.requests.Session()
+        
+        def request(method, url, payload=None):
+            response = session.request(method, self.base_url + url, json=payload, timeout=self.timeout)
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+            return response.status_code, data
+        
+        return request
+
+
+class LoadStats:
+    """按接口汇总请求耗时和错误数（线程安全）"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}  # 接口 -> [耗时(秒), ...]
+        self.errors = {}  # 接口 -> 错误数
+    
+    def record(self, endpoint, elapsed, ok):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+    
+    def summary(self, duration):
+        endpoints = {}
+        total = errors = 0
+        with self.lock:
+            for endpoint, latencies in sorted(self.latencies.items()):
+                latencies = sorted(latencies)
+                count, failed = len(latencies), self.errors.get(endpoint, 0)
+                total += count
+                errors += failed
+                endpoints[endpoint] = {
+                    'requests': count,
+                    'errors': failed,
+                    'error_rate': round(failed / count, 4),
+                    'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+                    'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+                    'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+                    'max_ms': round(latencies[-1] * 1000, 3)
+                }
+        return {
+            'requests': total,
+            'errors': errors,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'throughput_rps': round(total / duration, 2) if duration > 0 else 0.0,
+            'endpoints': endpoints
+        }
+
+
+def percentile(sorted_values, p):
+    """最近秩法计算分位数，sorted_values须已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def paper_counts(stats, total):
+    """按PAPER_MIX的比例在题库现有题型中分配试卷题数"""
+    counts = {}
+    for q_type, share in PAPER_MIX:
+        available = stats.get(q_type, 0)
+        if available:
+            counts[q_type] = min(available, max(1, round(total * share)))
+    return counts
+
+
+def choose_answer(question, rng):
+    """模拟考生作答：选择题随机选择，填空/简答题填写一段文字"""
+    options = question.get('options') or []
+    q_type = question.get('type')
+    if q_type == '多选题' and options:
+        return rng.sample(options, rng.randint(1, min(3, len(options))))
+    if options:
+        return [rng.choice(options)]
+    if q_type == '判断题':
+        return [rng.choice(['正确', '错误'])]
+    return ['考生作答内容']
+
+
+def run_student(student_id, request, stats, config):
+    """一名模拟考生的完整答题流程，返回是否顺利完成"""
+    rng = random.Random(config['seed'] + student_id)
+    
+    def call(method, url, endpoint, payload=None):
+        start = time.perf_counter()
+        try:
+            status, data = request(method, url, payload)
+        except Exception:
+            stats.record(endpoint, time.perf_counter() - start, False)
+            return None
+        ok = status < 400 and bool(data) and data.get('success', True) is not False
+        stats.record(endpoint, time.perf_counter() - start, ok)
+        return data if ok else None
+    
+    def think():
+        if config['think_time'] > 0:
+            time.sleep(rng.expovariate(1.0 / config['think_time']))
+    
+    if config['ramp_up'] > 0:
+        time.sleep(config['ramp_up'] * student_id / config['students'])
+    
+    loaded = call('POST', '/api/load_questions', 'POST /api/load_questions', {'file_path': config['bank']})
+    if loaded is None:
+        return False
+    counts = paper_counts(loaded.get('stats') or {}, config['questions'])
+    sheet = call('POST', '/api/extract_questions', 'POST /api/extract_questions',
+                 {'type_ratios': counts, 'lean': True})
+    if sheet is None:
+        return False
+    total = sheet['questions_count']
+    
+    questions = []
+    version = 0
+    for index in range(total):
+        if index == len(questions):
+            window = call('GET', f'/api/questions?start={index}&count={QUESTION_WINDOW}', 'GET /api/questions')
+            if window is None:
+                return False
+            questions.extend(window['questions'])
+        think()
+        # 切换到下一题时保存本题答案（与网页端批量保存的行为一致）
+        version += 1
+        saved = call('POST', '/api/answers', 'POST /api/answers',
+                     {'answers': {str(index): choose_answer(questions[index], rng)}, 'version': version,
+                      'paper_id': sheet['paper_id']})
+        if saved is None:
+            return False
+    
+    return call('POST', '/api/submit', 'POST /api/submit', {}) is not None
+
+
+def run_load_test(transport, config):
+    """启动全部模拟考生并等待完成，返回可序列化为JSON的结果"""
+    stats = LoadStats()
+    results = [False] * config['students']
+    
+    def worker(student_id):
+        try:
+            results[student_id] = run_student(student_id, transport.client(), stats, config)
+        except Exception as e:
+            print(f"考生 {student_id} 出错: {e}", file=sys.stderr)
+    
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(config['students'])]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+    
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'target': config['target'],
+        'students': config['students'],
+        'questions_per_paper': config['questions'],
+        'think_time': config['think_time'],
+        'duration_seconds': round(duration, 3),
+        'students_completed': sum(results),
+        'students_failed': config['students'] - sum(results)
+    }
+    report.update(stats.summary(duration))
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TG Helper Web版负载测试')
+    parser.add_argument('--students', type=int, default=60, help='同时答题的模拟考生数')
+    parser.add_argument('--questions', type=int, default=50, help='每份试卷的题数')
+    parser.add_argument('--think-time', type=float, default=0.5,
+                        help='每道题的平均思考时间（秒，按指数分布随机），0表示不等待')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='在多少秒内陆续启动全部考生')
+    parser.add_argument('--url', help='运行中的服务器地址（如 http://127.0.0.1:5000），不指定时使用进程内测试客户端')
+    parser.add_argument('--bank', help='题库文件（相对于服务器项目目录的路径），不指定时自动生成合成题库（仅限测试客户端）')
+    parser.add_argument('--bank-size', type=int, default=10000, help='自动生成的合成题库的题目数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', help='结果JSON文件路径，默认输出到标准输出')
+    args = parser.parse_args(argv)
+    
+    if args.students <= 0 or args.questions <= 0 or args.think_time < 0 or args.ramp_up < 0:
+        parser.error('考生数和题数必须是正整数，思考时间和启动时间不能为负数')
+    if args.url and not args.bank:
+        parser.error('对运行中的服务器测试时必须通过 --bank 指定服务器上的题库文件')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = None
+    try:
+        if not args.url:
+            # 测试客户端的临时目录放在项目目录下的隐藏目录中，Web接口只允许加载项目目录内的合成题库
+            workdir = tempfile.mkdtemp(prefix='.loadtest_', dir=BASE_DIR)
+        bank = args.bank
+        if not bank:
+            from benchmark import write_bank
+            bank_path = os.path.join(workdir, 'bank.json')
+            write_bank(bank_path, args.bank_size, args.seed)
+            bank = os.path.relpath(bank_path, BASE_DIR)
+        
+        transport = HttpTransport(args.url) if args.url else TestClientTransport(workdir)
+        config = {
+            'target': args.url or 'test_client',
+            'bank': bank,
+            'students': args.students,
+            'questions': args.questions,
+            'think_time': args.think_time,
+            'ramp_up': args.ramp_up,
+            'seed': args.seed
+        }
+        print(f"模拟 {args.students} 名考生（{config['target']}）...", file=sys.stderr)
+        report = run_load_test(transport, config)
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"结果已保存到 {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,6 @@
 import sys
 import json
 import os
-import random
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -18,6 +17,12 @@ from PyQt5.QtGui import QFont, QPalette, QColor
 
 # 导入BrowserWindow类
 from browser_source_saver import BrowserWindow
+from question_bank import (
+    TYPE_ORDER, MultiBankView, QuestionBank, build_search_index_in_background, question_fingerprint, sample_by_type
+)
+from grading import grade_session
+from weighted_sampling import QuestionHistory, WeightedSamplerCache
+from search_index import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SearchResult
 
 try:
     from deepseek_parser import DeepSeekParserWindow
@@ -35,46 +40,69 @@ class QuestionManager:
     def __init__(self):
         self.questions = []
         self.question_stats = {}
+        self.type_index = {}
+        self.bank = None
         self.selected_questions = []
         self.current_question_index = 0
         self.user_answers = {}
         self.viewed_answers = {}
         self.current_file = "questions.json"  # 默认题库文件
+        self.history = QuestionHistory()  # 做题记录，用于加权抽题
+        self.weighted_samplers = WeightedSamplerCache()  # 加权抽题时复用的权重树状数组
         
-    def load_questions(self, file_path):
-        """加载题库文件"""
+    def load_questions(self, file_path, on_progress=None):
+        """加载题库文件（优先使用旁路缓存），on_progress用于在加载过程中显示部分统计"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                self.questions = json.load(f)
-            
-            # 自动识别选择题类型：根据正确答案数量将"选择题"转换为"单选题"或"多选题"
-            for question in self.questions:
-                if question.get('type') == '选择题':
-                    correct_answers = question.get('correct_answer', [])
-                    # 过滤掉空答案
-                    correct_answers = [ans for ans in correct_answers if ans.strip()]
-                    
-                    if len(correct_answers) > 1:
-                        question['type'] = '多选题'
-                    else:
-                        question['type'] = '单选题'
-            
+            bank = QuestionBank.load(file_path, on_progress=on_progress)
+            self._use_bank(bank)
             self.current_file = file_path
-            self._calculate_stats()
             return True
         except Exception as e:
             print(f"加载题库失败: {e}")
             return False
     
-    def _calculate_stats(self):
-        """计算各题型数量"""
-        self.question_stats.clear()
-        for question in self.questions:
-            q_type = question['type']
-            if q_type in self.question_stats:
-                self.question_stats[q_type] += 1
+    def load_question_files(self, file_paths):
+        """同时加载多个题库文件作为一个虚拟题库，各文件分段保存，不拼接题目列表
+        
+        再次加载相同的文件组合时，只重新加载自上次加载以来有变化的文件。
+        """
+        try:
+            file_paths = list(file_paths)
+            if isinstance(self.questions, MultiBankView) and self.questions.paths == file_paths:
+                view = self.questions.refreshed()
             else:
-                self.question_stats[q_type] = 1
+                view = MultiBankView.load(file_paths)
+            self._use_bank(view)
+            self.current_file = " + ".join(file_paths)
+            return True
+        except Exception as e:
+            print(f"加载题库失败: {e}")
+            return False
+    
+    def reload_question_file(self, file_path):
+        """重新加载虚拟题库中的某个文件，只重建该文件对应的分段；file_path不是当前题库的文件时返回False"""
+        if not isinstance(self.questions, MultiBankView):
+            if os.path.abspath(file_path) != os.path.abspath(self.current_file):
+                return False
+            return self.load_questions(file_path)
+        try:
+            view = self.questions.with_segment_reloaded(file_path)
+            if view is None:
+                return False
+            self._use_bank(view)
+            return True
+        except Exception as e:
+            print(f"加载题库失败: {e}")
+            return False
+    
+    def _use_bank(self, bank):
+        """切换到新加载的题库（单个题库或虚拟题库）"""
+        self.questions = bank.questions
+        self.type_index = bank.type_index
+        self.question_stats = bank.stats
+        # 全文搜索索引在后台构建，加载题库时无需等待；后台尚未建好时首次搜索会等待其完成
+        self.bank = bank
+        build_search_index_in_background(bank)
     
     def get_stats(self):
         """获取题库统计信息"""
@@ -109,42 +137,47 @@ class QuestionManager:
         
         return self._extract_by_counts(question_counts)
     
-    def extract_questions_by_count(self, type_counts):
-        """根据直接数量配置抽取题目"""
-        return self._extract_by_counts(type_counts)
+    def extract_questions_by_count(self, type_counts, weight_mode=None, tag_weights=None):
+        """根据直接数量配置抽取题目
+    
+        weight_mode为None时等概率抽取；为'wrong'、'stale'或'tags'时分别按答错次数、
+        未练习时长或标签权重（tag_weights）加权抽取。
+        """
+        return self._extract_by_counts(type_counts, weight_mode, tag_weights)
     
-    def _extract_by_counts(self, type_counts):
+    def _extract_by_counts(self, type_counts, weight_mode=None, tag_weights=None):
         """根据各题型数量抽取题目"""
         self.selected_questions = []
         self.user_answers = {}
         self.viewed_answers = {}
         self.current_question_index = 0
         
-        # 定义优先题型顺序
-        type_order = ['单选题', '多选题', '判断题', '填空题', '简答题', '释义题']
+        weighted = None
+        if weight_mode:
+            weighted = self.weighted_samplers.sampler(weight_mode, self.history, tag_weights, question_fingerprint)
         
-        # 处理优先顺序中的题型
-        processed_types = set()
-        for q_type in type_order:
-            if q_type in type_counts and type_counts[q_type] > 0:
-                # 筛选出该题型的所有题目
-                type_questions = [q for q in self.questions if q['type'] == q_type]
-                
-                # 随机抽取指定数量的题目
-                selected = random.sample(type_questions, min(type_counts[q_type], len(type_questions)))
-                self.selected_questions.extend(selected)
-                processed_types.add(q_type)
-        
-        # 处理剩余的其他题型（不在优先顺序列表中但用户选择了的题型）
-        for q_type in type_counts:
-            if q_type not in processed_types and type_counts[q_type] > 0:
-                # 筛选出该题型的所有题目
-                type_questions = [q for q in self.questions if q['type'] == q_type]
-                if type_questions:
-                    # 随机抽取指定数量的题目
-                    selected = random.sample(type_questions, min(type_counts[q_type], len(type_questions)))
-                    self.selected_questions.extend(selected)
+        # 按题型索引抽取，无需每次扫描整个题库
+        self.selected_questions = sample_by_type(self.questions, self.type_index, type_counts, weighted=weighted)
+        
+        # 记录本次抽到的题目，用于按未练习时长加权
+        self.history.record_seen(question_fingerprint(q) for q in self.selected_questions)
+        
+        return self.selected_questions
+    
+    def search_questions(self, query, page=1, page_size=DEFAULT_PAGE_SIZE):
+        """全文搜索题干、选项和解析，返回按相关度排序的分页结果"""
+        if self.bank is None:
+            return SearchResult(0, [])
+        return self.bank.search_index.search(query, page, page_size)
+    
+    def select_questions(self, indices):
+        """以指定下标的题目（如搜索结果）组成试卷"""
+        self.selected_questions = [self.questions[i] for i in indices]
+        self.user_answers = {}
+        self.viewed_answers = {}
+        self.current_question_index = 0
         
+        self.history.record_seen(question_fingerprint(q) for q in self.selected_questions)
         return self.selected_questions
     
     def get_current_question(self):
@@ -171,42 +204,12 @@ class QuestionManager:
     
     def get_wrong_questions(self):
         """获取答错的题目"""
-        wrong_questions = []
-        for i, question in enumerate(self.selected_questions):
-            user_answer = self.get_user_answer(i)
-            correct_answer = question['correct_answer']
-            
-            # 根据题型检查答案是否正确
-            is_correct = False
-            if question['type'] in ['单选题', '判断题', '多选题', '选择题']:
-                # 检查正确答案是否为仅选项字母格式
-                is_letter_format = False
-                import re
-                
-                if correct_answer:
-                    first_answer = correct_answer[0]
-                    # 检查第一个正确答案是否仅包含一个字母
-                    if re.match(r'^[A-Za-z]$', first_answer):
-                        is_letter_format = True
-                
-                if is_letter_format:
-                    # 如果是字母格式，直接比较字母集合
-                    is_correct = set(user_answer) == set(correct_answer)
-                else:
-                    # 如果是完整文本格式，比较文本集合
-                    is_correct = set(user_answer) == set(correct_answer)
-            elif question['type'] in ['填空题', '简答题', '释义题']:
-                if len(user_answer) == len(correct_answer):
-                    is_all_correct = True
-                    for ua, ca in zip(user_answer, correct_answer):
-                        if ua.strip() != ca.strip():
-                            is_all_correct = False
-                            break
-                    is_correct = is_all_correct
-            
-            if not is_correct:
-                wrong_questions.append(question)
-        return wrong_questions
+        result = grade_session(self.selected_questions, self.user_answers)
+        return [self.selected_questions[i] for i in result.wrong_indices]
+    
+    def record_wrong_answers(self, wrong_indices):
+        """记录答错的题目，用于按答错次数加权抽题"""
+        self.history.record_wrong(question_fingerprint(self.selected_questions[i]) for i in wrong_indices)
     
     def export_wrong_questions(self, file_path):
         """导出答错的题目到文件"""
@@ -216,7 +219,7 @@ class QuestionManager:
         
         try:
             with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(wrong_questions, f, ensure_ascii=False, indent=2)
+                json.dump([q.to_dict() for q in wrong_questions], f, ensure_ascii=False, indent=2)
             return True, f"错题本已导出到: {file_path}"
         except Exception as e:
             return False, f"导出失败: {e}"
@@ -258,6 +261,25 @@ class ConfigWindow(QWidget):
         file_layout.addStretch()
         self.main_layout.addLayout(file_layout)
         
+        # 全文搜索区域
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索题干、选项或解析")
+        self.search_input.returnPressed.connect(self.search_questions)
+        search_button = QPushButton("搜索")
+        search_button.clicked.connect(self.search_questions)
+        self.search_result_label = QLabel("")
+        self.search_exam_button = QPushButton("用搜索结果答题")
+        self.search_exam_button.setEnabled(False)
+        self.search_exam_button.clicked.connect(self.start_search_exam)
+        self.search_hits = []
+        
+        search_layout.addWidget(self.search_input)
+        search_layout.addWidget(search_button)
+        search_layout.addWidget(self.search_result_label)
+        search_layout.addWidget(self.search_exam_button)
+        self.main_layout.addLayout(search_layout)
+        
         # 加载默认题库
         self.question_manager.load_questions(self.question_manager.current_file)
         
@@ -329,6 +351,18 @@ class ConfigWindow(QWidget):
         # 创建菜单
         menu = QMenu(self)
         
+        # 同时加载多个题库
+        multi_action = menu.addAction("同时加载多个题库...")
+        multi_action.triggered.connect(self.load_multiple_question_files)
+        
+        # 当前为虚拟题库时，可以只重新加载其中的某个文件
+        if isinstance(self.question_manager.questions, MultiBankView):
+            reload_menu = menu.addMenu("重新加载其中一个题库")
+            for path in self.question_manager.questions.paths:
+                action = reload_menu.addAction(path)
+                action.triggered.connect(lambda checked, f=path: self.reload_member_file(f))
+        menu.addSeparator()
+        
         # 添加默认题库选项（如果存在）
         if 'questions.json' in json_files:
             default_action = menu.addAction("questions.json")
@@ -379,36 +413,77 @@ class ConfigWindow(QWidget):
     
     def load_question_file(self, file_path):
         """加载指定的题库文件"""
-        if self.question_manager.load_questions(file_path):
-            self.file_combo.setText(file_path)
-            
-            # 更新统计信息
-            stats = self.question_manager.get_stats()
-            stats_text = "题库统计：\n"
+        # 加载过程中实时显示已读取的题目统计
+        previous_text = self.stats_label.text()
+        
+        def show_progress(loaded, stats):
+            progress_text = f"题库统计：（正在加载，已读取{loaded}题）\n"
             for q_type, count in stats.items():
-                stats_text += f"{q_type}: {count}题\n"
-            
-            # 查找并更新统计信息标签
-            stats_label = None
-            for i in range(self.layout().count()):
-                widget = self.layout().itemAt(i).widget()
-                if widget and isinstance(widget, QLabel) and "题库统计：" in widget.text():
-                    stats_label = widget
-                    break
-            
-            if stats_label:
-                stats_label.setText(stats_text)
-            else:
-                # 如果没有统计信息标签，创建一个
-                stats_label = QLabel(stats_text)
-            stats_label.setFont(QFont("Microsoft YaHei UI, Arial", 10))
-            self.layout().insertWidget(3, stats_label)
-            
-            # 更新题型数量设置
-            self.update_type_count_inputs()
+                progress_text += f"{q_type}: {count}题\n"
+            self.stats_label.setText(progress_text)
+            QApplication.processEvents()
+        
+        if self.question_manager.load_questions(file_path, on_progress=show_progress):
+            self._refresh_loaded_bank(file_path)
         else:
+            self.stats_label.setText(previous_text)
             QMessageBox.warning(self, "错误", f"无法加载题库文件：{file_path}")
     
+    def load_multiple_question_files(self):
+        """选择多个题库文件，作为一个虚拟题库同时加载"""
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "选择多个题库文件", ".", "JSON文件 (*.json)"
+        )
+        if not file_paths:
+            return
+        file_paths = [os.path.relpath(path) for path in file_paths]
+        
+        if self.question_manager.load_question_files(file_paths):
+            self._refresh_loaded_bank(self.question_manager.current_file)
+        else:
+            QMessageBox.warning(self, "错误", "无法加载所选的题库文件")
+    
+    def reload_member_file(self, file_path):
+        """重新加载虚拟题库中的某个文件，其余文件的分段直接复用"""
+        if self.question_manager.reload_question_file(file_path):
+            self._refresh_loaded_bank(self.question_manager.current_file)
+        else:
+            QMessageBox.warning(self, "错误", f"无法重新加载题库文件：{file_path}")
+    
+    def _refresh_loaded_bank(self, display_name):
+        """题库加载成功后更新当前题库名称、统计信息和题型数量设置"""
+        self.file_combo.setText(display_name)
+        
+        # 搜索结果属于之前的题库，需要重新搜索
+        self.search_hits = []
+        self.search_result_label.setText("")
+        self.search_exam_button.setEnabled(False)
+        
+        # 更新统计信息
+        stats = self.question_manager.get_stats()
+        stats_text = "题库统计：\n"
+        for q_type, count in stats.items():
+            stats_text += f"{q_type}: {count}题\n"
+        
+        # 查找并更新统计信息标签
+        stats_label = None
+        for i in range(self.layout().count()):
+            widget = self.layout().itemAt(i).widget()
+            if widget and isinstance(widget, QLabel) and "题库统计：" in widget.text():
+                stats_label = widget
+                break
+        
+        if stats_label:
+            stats_label.setText(stats_text)
+        else:
+            # 如果没有统计信息标签，创建一个
+            stats_label = QLabel(stats_text)
+        stats_label.setFont(QFont("Microsoft YaHei UI, Arial", 10))
+        self.layout().insertWidget(3, stats_label)
+        
+        # 更新题型数量设置
+        self.update_type_count_inputs()
+    
     def update_type_count_inputs(self):
         """更新题型数量输入框"""
         # 移除现有的题型数量设置
@@ -469,6 +544,36 @@ class ConfigWindow(QWidget):
     
 
     
+    def search_questions(self):
+        """在当前题库中全文搜索，记录相关度最高的若干题用于答题"""
+        query = self.search_input.text().strip()
+        self.search_hits = []
+        if not query:
+            self.search_result_label.setText("")
+            self.search_exam_button.setEnabled(False)
+            return
+        
+        result = self.question_manager.search_questions(query, page_size=MAX_PAGE_SIZE)
+        self.search_hits = [index for index, _ in result.hits]
+        result_text = f"找到{result.total}题"
+        if result.total > len(self.search_hits):
+            result_text += f"（答题时使用相关度最高的{len(self.search_hits)}题）"
+        self.search_result_label.setText(result_text)
+        self.search_exam_button.setEnabled(bool(self.search_hits))
+    
+    def start_search_exam(self):
+        """以搜索结果组成试卷开始答题"""
+        if not self.search_hits:
+            QMessageBox.warning(self, "无法开始", "没有可用的搜索结果，请先搜索")
+            return
+        
+        self.question_manager.select_questions(self.search_hits)
+        
+        # 打开答题界面
+        self.exam_window = ExamWindow(self.question_manager, study_mode=self.study_mode_check.isChecked())
+        self.exam_window.show()
+        self.hide()
+    
     def start_exam(self):
         """开始答题"""
         try:
@@ -669,13 +774,10 @@ class ExamWindow(QWidget):
         # 获取当前已抽取的题目（分题型后的顺序）
         questions = self.question_manager.selected_questions
         
-        # 定义题型顺序
-        type_order = ['单选题', '多选题', '判断题', '填空题', '简答题', '释义题']
-        
         # 创建题型分组，按分题型后的顺序计算序号
         current_number = 1
         
-        for q_type in type_order:
+        for q_type in TYPE_ORDER:
             # 筛选该题型的题目
             type_questions = [q for q in questions if q['type'] == q_type]
             if not type_questions:
@@ -1310,37 +1412,12 @@ class ExamWindow(QWidget):
         # 保存当前答案
         self._save_current_answer()
         
-        # 计算成绩
-        total_questions = len(self.question_manager.selected_questions)
-        correct_count = 0
-        
-        for i in range(total_questions):
-            question = self.question_manager.selected_questions[i]
-            user_answer = self.question_manager.get_user_answer(i)
-            correct_answer = question['correct_answer']
-            
-            # 比较答案
-            if question['type'] in ['单选题', '判断题']:
-                # 单选题和判断题
-                if set(user_answer) == set(correct_answer):
-                    correct_count += 1
-            elif question['type'] == '多选题':
-                # 多选题
-                if set(user_answer) == set(correct_answer):
-                    correct_count += 1
-            elif question['type'] in ['填空题', '简答题', '释义题']:
-                # 填空题、简答题和释义题
-                if len(user_answer) == len(correct_answer):
-                    is_all_correct = True
-                    for ua, ca in zip(user_answer, correct_answer):
-                        if ua.strip() != ca.strip():
-                            is_all_correct = False
-                            break
-                    if is_all_correct:
-                        correct_count += 1
-        
-        # 计算得分（满分100）
-        score = round((correct_count / total_questions) * 100, 1) if total_questions > 0 else 0
+        # 计算成绩，一次遍历同时得到得分和正确题数
+        result = grade_session(self.question_manager.selected_questions, self.question_manager.user_answers)
+        score = result.score
+        correct_count = result.correct_count
+        total_questions = result.total_questions
+        self.question_manager.record_wrong_answers(result.wrong_indices)
         
         # 创建自定义消息框
         msg_box = QMessageBox()
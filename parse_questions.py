@@ -1,16 +1,97 @@
 import os
 import re
 import json
+import hashlib
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 
+from question_bank import question_fingerprint
 
-def parse_html_to_json(file_path):
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# 解析引擎：bs4-BeautifulSoup（html.parser），lxml-基于lxml和预编译XPath的快速引擎（结果与bs4相同）；
+# 可通过环境变量PARSE_ENGINE设置，默认bs4
+ENGINES = ('bs4', 'lxml')
+DEFAULT_ENGINE = os.environ.get('PARSE_ENGINE', 'bs4')
+
+# 并行解析时使用的进程数，可通过环境变量PARSE_WORKERS设置，默认1（逐个解析）；0表示使用全部CPU核心
+DEFAULT_WORKERS = int(os.environ.get('PARSE_WORKERS', '1'))
+
+# 捕捉清单的格式版本，解析逻辑变化时递增，旧清单会被整体作废并重新解析
+MANIFEST_VERSION = 1
+
+
+def parse_html_to_json(file_path, engine=DEFAULT_ENGINE):
     """
     解析HTML文件，提取题目信息并转换为JSON格式
     """
     with open(file_path, 'r', encoding='utf-8') as f:
         html_content = f.read()
+    return parse_html_content(html_content, engine)
+
+
+def parse_html_content(html_content, engine=DEFAULT_ENGINE):
+    """
+    按指定的引擎解析HTML内容；lxml引擎无法保证与BeautifulSoup结果一致的页面（或lxml不可用时）使用BeautifulSoup解析
+    """
+    if engine == 'lxml' and LXML_AVAILABLE:
+        try:
+            return _parse_with_lxml(html_content)
+        except Exception:
+            pass
+    return _parse_with_soup(html_content)
+
+
+def _blank_question_type(content, rows, style):
+    """
+    根据题目内容和textarea的行数、高度判断是填空题、简答题还是释义题
+    """
+    q_type = '填空题'
+    
+    # 检查题目内容中是否包含释义题相关关键词
+    is_paraphrase = False
+    if content:
+        # 检查题目内容中是否包含释义相关关键词
+        paraphrase_keywords = ['解释', '释义', '说明', '什么是', '简述']
+        for keyword in paraphrase_keywords:
+            if keyword in content:
+                is_paraphrase = True
+                break
+    
+    # 检查textarea的属性
+    if rows:
+        try:
+            if int(rows) > 1:
+                if is_paraphrase:
+                    q_type = '释义题'
+                else:
+                    q_type = '简答题'
+        except ValueError:
+            pass
+    elif 'height' in style:
+        # 简单解析style中的height属性
+        height_match = re.search(r'height:\s*(\d+)px', style)
+        if height_match:
+            try:
+                if int(height_match.group(1)) > 50:
+                    if is_paraphrase:
+                        q_type = '释义题'
+                    else:
+                        q_type = '简答题'
+            except ValueError:
+                pass
     
+    return q_type
+
+
+def _parse_with_soup(html_content):
+    """使用BeautifulSoup（html.parser）解析"""
     soup = BeautifulSoup(html_content, 'html.parser')
     
     # 获取标题
@@ -66,45 +147,8 @@ def parse_html_to_json(file_path):
         
         if textarea:
             # 根据textarea的属性判断是填空题、简答题还是释义题
-            question['type'] = '填空题'
-            
-            # 检查textarea的高度或行数属性，判断是否为简答题或释义题
-            rows = textarea.get('rows', '')
-            style = textarea.get('style', '')
-            
-            # 检查题目内容中是否包含释义题相关关键词
-            content = question.get('content', '')
-            is_paraphrase = False
-            if content:
-                # 检查题目内容中是否包含释义相关关键词
-                paraphrase_keywords = ['解释', '释义', '说明', '什么是', '简述']
-                for keyword in paraphrase_keywords:
-                    if keyword in content:
-                        is_paraphrase = True
-                        break
-            
-            # 检查textarea的属性
-            if rows:
-                try:
-                    if int(rows) > 1:
-                        if is_paraphrase:
-                            question['type'] = '释义题'
-                        else:
-                            question['type'] = '简答题'
-                except ValueError:
-                    pass
-            elif 'height' in style:
-                # 简单解析style中的height属性
-                height_match = re.search(r'height:\s*(\d+)px', style)
-                if height_match:
-                    try:
-                        if int(height_match.group(1)) > 50:
-                            if is_paraphrase:
-                                question['type'] = '释义题'
-                            else:
-                                question['type'] = '简答题'
-                    except ValueError:
-                        pass
+            question['type'] = _blank_question_type(question.get('content', ''), textarea.get('rows', ''),
+                                                    textarea.get('style', ''))
             
             # 填空题、简答题和释义题的正确答案都在textarea的内容中
             value = textarea.text.strip() or textarea.string.strip() if textarea.string else ''
@@ -166,28 +210,390 @@ def parse_html_to_json(file_path):
     return questions
 
 
-def process_all_html_files():
+class _UnsupportedPage(Exception):
+    """页面中含有lxml与html.parser解析结果可能不同的结构，改用BeautifulSoup解析"""
+
+
+# BeautifulSoup视为空白的字符
+_ASCII_SPACES = ' \n\t\x0c\r'
+
+# html.parser会把textarea、title中的标签当作元素解析，lxml则当作文本；显式的checked="checked"在lxml中
+# 与不带值的checked无法区分。含有这些结构的页面，以及lxml报告了解析错误（需要修正标签嵌套）的页面改用BeautifulSoup解析
+_RAW_TEXT_TAG_PATTERN = re.compile(r'<(textarea|title)\b[^>]*>', re.I)
+_EXPLICIT_CHECKED_PATTERN = re.compile(r'\schecked\s*=\s*["\']?checked', re.I)
+
+
+def _has_class(name):
+    """XPath条件：class属性按空白分隔后包含name（与BeautifulSoup的class_参数一致）"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+if LXML_AVAILABLE:
+    _XPATH_TITLE = etree.XPath('(//title)[1]')
+    _XPATH_SUBJECTS = etree.XPath(f'//*[{_has_class("subject")}]')
+    _XPATH_SUBJECT_BODY = etree.XPath(f'descendant::*[{_has_class("subject-body")}][1]')
+    _XPATH_OPTION = etree.XPath(f'descendant::*[{_has_class("option")}][1]')
+    _XPATH_PARENT_LI = etree.XPath('ancestor::li[1]')
+    _XPATH_TEXTAREA = etree.XPath('descendant::textarea[1]')
+    _XPATH_NEXT_OPTION_DIV = etree.XPath(f'following-sibling::div[{_has_class("option")}][1]')
+    _XPATH_RADIO_GROUP = etree.XPath(f'descendant::*[{_has_class("ant-radio-group")}][1]')
+    _XPATH_RADIO_WRAPPERS = etree.XPath(f'descendant::*[{_has_class("ant-radio-wrapper")}]')
+    _XPATH_RADIO_LABEL = etree.XPath(f'descendant::span[{_has_class("ant-radio-label")}][1]')
+    _XPATH_OPTION_LINKS = etree.XPath(f'descendant::a[{_has_class("flex-container")}]')
+    _XPATH_CHECK_TITLE = etree.XPath(f'descendant::*[{_has_class("checkTitle")}][1]')
+    _XPATH_HAS_RADIO = etree.XPath('boolean(descendant::input[@type="radio"])')
+    _XPATH_HAS_CHECKBOX = etree.XPath('boolean(descendant::input[@type="checkbox"])')
+    _XPATH_IS_CHECKED = etree.XPath('boolean(descendant::input[@checked="" or @checked="checked"])')
+    # get_text不包含script、style、template、rt、rp中的文本
+    _XPATH_TEXT_NODES = etree.XPath('descendant::text()[not(ancestor::script or ancestor::style '
+                                    'or ancestor::template or ancestor::rt or ancestor::rp)]')
+    _XPATH_PRESERVES_SPACE = etree.XPath('boolean(ancestor-or-self::pre or ancestor-or-self::textarea)')
+
+
+def _check_lxml_compatible(html_content):
+    if _EXPLICIT_CHECKED_PATTERN.search(html_content):
+        raise _UnsupportedPage('checked="checked"')
+    for match in _RAW_TEXT_TAG_PATTERN.finditer(html_content):
+        end_tag = f'</{match.group(1).lower()}'
+        next_tag = html_content.find('<', match.end())
+        if next_tag == -1 or html_content[next_tag:next_tag + len(end_tag)].lower() != end_tag:
+            raise _UnsupportedPage(match.group(1))
+
+
+def _lxml_text(element):
+    """与BeautifulSoup的.text相同的文本：只含空白的文本段（pre、textarea之外）合并为一个空格或换行"""
+    parts = []
+    for text in _XPATH_TEXT_NODES(element):
+        if not text.strip(_ASCII_SPACES):
+            container = text.getparent()
+            if text.is_tail:
+                container = container.getparent()
+            if not _XPATH_PRESERVES_SPACE(container):
+                text = '\n' if '\n' in text else ' '
+        parts.append(text)
+    return ''.join(parts)
+
+
+def _parse_with_lxml(html_content):
+    """
+    使用lxml和预编译的XPath解析，逐项对应_parse_with_soup中的查找，结果与其相同
+    """
+    _check_lxml_compatible(html_content)
+    parser = etree.HTMLParser(huge_tree=True)
+    root = etree.fromstring(html_content, parser)
+    if root is None or len(parser.error_log):
+        raise _UnsupportedPage('parser errors')
+    
+    title_elements = _XPATH_TITLE(root)
+    title = _lxml_text(title_elements[0]) if title_elements else '未知标题'
+    
+    questions = []
+    for i, subject in enumerate(_XPATH_SUBJECTS(root)):
+        question = {
+            'id': i + 1,
+            'title': title,
+            'type': '',
+            'content': '',
+            'options': [],
+            'correct_answer': [],
+            'analysis': ''
+        }
+        
+        content_divs = _XPATH_SUBJECT_BODY(subject)
+        if content_divs:
+            question['content'] = _lxml_text(content_divs[0]).strip()
+        
+        subject_parent = subject.getparent()
+        option_containers = _XPATH_OPTION(subject_parent)
+        
+        # 填空题：先在所在的li中查找textarea，再在相邻的选项容器中查找
+        textarea = None
+        li_elements = _XPATH_PARENT_LI(subject)
+        if li_elements:
+            textareas = _XPATH_TEXTAREA(li_elements[0])
+            if textareas:
+                textarea = textareas[0]
+        if textarea is None:
+            option_divs = _XPATH_NEXT_OPTION_DIV(subject) or _XPATH_NEXT_OPTION_DIV(subject_parent)
+            if option_divs:
+                textareas = _XPATH_TEXTAREA(option_divs[0])
+                if textareas:
+                    textarea = textareas[0]
+        
+        if textarea is not None:
+            question['type'] = _blank_question_type(question['content'], textarea.get('rows', ''),
+                                                    textarea.get('style', ''))
+            raw_text = textarea.text
+            value = (_lxml_text(textarea).strip() or raw_text.strip()) if raw_text else ''
+            if value:
+                answers = re.split(r'[,;，；]', value)
+                question['correct_answer'] = [answer.strip() for answer in answers if answer.strip()]
+            questions.append(question)
+            continue
+        
+        radio_groups = _XPATH_RADIO_GROUP(subject_parent)
+        if radio_groups:
+            question['type'] = '判断题'
+            for label in _XPATH_RADIO_WRAPPERS(radio_groups[0]):
+                option_text = _lxml_text(_XPATH_RADIO_LABEL(label)[0]).strip()
+                question['options'].append(option_text)
+                if 'ant-radio-wrapper-checked' in label.get('class', '').split():
+                    question['correct_answer'].append(option_text)
+            questions.append(question)
+            continue
+        
+        if option_containers:
+            option_container = option_containers[0]
+            for opt in _XPATH_OPTION_LINKS(option_container):
+                label = _lxml_text(_XPATH_CHECK_TITLE(opt)[0]).strip()
+                content = _lxml_text(_XPATH_SUBJECT_BODY(opt)[0]).strip()
+                question['options'].append(f"{label} {content}")
+                if _XPATH_IS_CHECKED(opt):
+                    question['correct_answer'].append(f"{label} {content}")
+            if _XPATH_HAS_CHECKBOX(option_container):
+                question['type'] = '多选题'
+            elif _XPATH_HAS_RADIO(option_container):
+                question['type'] = '单选题'
+        questions.append(question)
+    
+    return questions
+
+
+def check_engine_parity(file_paths):
+    """
+    比较lxml引擎与BeautifulSoup对每个页面的解析结果，返回统计信息和结果不一致的页面
+    
+    含有lxml无法保证一致的结构而改用BeautifulSoup解析的页面单独列出。
+    """
+    mismatched = []
+    fallback = []
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        try:
+            actual = _parse_with_lxml(html_content)
+        except Exception:
+            fallback.append(file_path)
+            continue
+        try:
+            expected = _parse_with_soup(html_content)
+        except Exception:
+            expected = None
+        if actual != expected:
+            mismatched.append(file_path)
+    return {
+        'pages': len(file_paths),
+        'identical': len(file_paths) - len(mismatched) - len(fallback),
+        'fallback': fallback,
+        'mismatched': mismatched
+    }
+
+
+def deduplicate_questions(questions):
+    """
+    按题型、题干和选项的规范化内容哈希去除重复题目
+    
+    重复题目只保留第一次出现的那道；若重复题目的答案或解析不一致，
+    用非空的答案补全缺失的答案、保留更完整的解析，并在汇总中记录冲突。
+    返回(去重后的题目列表, 合并汇总列表)。
+    """
+    unique_questions = []
+    seen = {}  # 内容指纹 -> 在unique_questions中的位置
+    summary = {}  # 内容指纹 -> 合并信息
+    
+    for question in questions:
+        fingerprint = question_fingerprint(question)
+        position = seen.get(fingerprint)
+        if position is None:
+            seen[fingerprint] = len(unique_questions)
+            unique_questions.append(question)
+            continue
+        
+        kept = unique_questions[position]
+        entry = summary.get(fingerprint)
+        if entry is None:
+            entry = summary[fingerprint] = {
+                'title': kept.get('title', ''),
+                'type': kept.get('type', ''),
+                'content': kept.get('content', ''),
+                'duplicates': 0,
+                'notes': []
+            }
+        entry['duplicates'] += 1
+        
+        # 合并正确答案
+        kept_answer = kept.get('correct_answer') or []
+        new_answer = question.get('correct_answer') or []
+        if not kept_answer and new_answer:
+            kept['correct_answer'] = new_answer
+            entry['notes'].append(f"补全答案: {new_answer}")
+        elif kept_answer and new_answer and kept_answer != new_answer:
+            entry['notes'].append(f"答案不一致，保留 {kept_answer}，忽略 {new_answer}")
+        
+        # 合并解析，保留更完整的解析
+        kept_analysis = kept.get('analysis') or ''
+        new_analysis = question.get('analysis') or ''
+        if new_analysis and new_analysis != kept_analysis and len(new_analysis) > len(kept_analysis):
+            kept['analysis'] = new_analysis
+            entry['notes'].append("采用更完整的解析")
+    
+    return unique_questions, list(summary.values())
+
+
+def write_dedup_summary(summary, summary_file, total_before, total_after):
+    """将去重汇总写入文本文件"""
+    lines = [f"去重前共{total_before}道题目，去重后共{total_after}道题目，合并{total_before - total_after}道重复题目", ""]
+    for entry in summary:
+        content = entry['content'].replace('\n', ' ')
+        if len(content) > 60:
+            content = content[:60] + '...'
+        lines.append(f"【{entry['type']}】{entry['title']} - {content}（重复{entry['duplicates']}次）")
+        for note in entry['notes']:
+            lines.append(f"    {note}")
+    
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def parse_html_files(file_paths, workers=DEFAULT_WORKERS, engine=DEFAULT_ENGINE):
+    """
+    解析多个HTML文件，按file_paths的顺序返回每个文件的题目列表
+    
+    workers大于1时使用多进程并行解析（0表示使用全部CPU核心），结果顺序与逐个解析相同。
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(file_paths))
+    parse = partial(parse_html_to_json, engine=engine)
+    if workers <= 1:
+        return [parse(file_path) for file_path in file_paths]
+    
+    # 每个进程一次领取多个文件，减少进程间通信的次数
+    chunksize = max(1, len(file_paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse, file_paths, chunksize=chunksize))
+
+
+def _file_digest(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_manifest(manifest_path):
+    """读取捕捉清单，文件不存在、损坏或版本不符时返回空清单"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION and isinstance(manifest.get('files'), dict):
+            return manifest
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {'version': MANIFEST_VERSION, 'files': {}}
+
+
+def save_manifest(manifest_path, manifest):
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def collect_questions(html_dir, manifest_path, workers=DEFAULT_WORKERS, full_rebuild=False, engine=DEFAULT_ENGINE):
     """
-    处理html文件夹中的所有HTML文件
+    按文件名顺序收集html_dir中所有捕捉页面的题目，只解析新增或内容变化的页面
+    
+    捕捉清单记录每个页面的大小、修改时间、内容哈希和解析出的题目：大小和修改时间未变的页面直接复用，
+    变化的页面先比较内容哈希，内容确实变化才重新解析；已删除页面的题目从清单中移除。
+    返回(各页面题目依次拼接的列表, 统计信息)。
+    """
+    old_files = {} if full_rebuild else load_manifest(manifest_path)['files']
+    filenames = sorted(filename for filename in os.listdir(html_dir) if filename.endswith('.html'))
+    
+    files = {}
+    to_parse = []
+    for filename in filenames:
+        file_path = os.path.join(html_dir, filename)
+        stat = os.stat(file_path)
+        entry = old_files.get(filename)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            files[filename] = entry
+            continue
+        digest = _file_digest(file_path)
+        if entry is not None and entry['sha256'] == digest:
+            # 只是修改时间变化，内容未变
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            files[filename] = entry
+            continue
+        files[filename] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+        to_parse.append(filename)
+    
+    parsed = parse_html_files([os.path.join(html_dir, filename) for filename in to_parse], workers, engine)
+    for filename, questions in zip(to_parse, parsed):
+        files[filename]['ids'] = [question['id'] for question in questions]
+        files[filename]['questions'] = questions
+    
+    save_manifest(manifest_path, {'version': MANIFEST_VERSION, 'files': files})
+    
+    all_questions = []
+    for filename in filenames:
+        all_questions.extend(files[filename]['questions'])
+    stats = {
+        'files': len(filenames),
+        'parsed': len(to_parse),
+        'reused': len(filenames) - len(to_parse),
+        'removed': len(set(old_files) - set(files))
+    }
+    return all_questions, stats
+
+
+def process_all_html_files(workers=DEFAULT_WORKERS, full_rebuild=False, engine=DEFAULT_ENGINE):
+    """
+    处理html文件夹中的所有HTML文件，返回统计信息（页面数、重新解析数、复用数、移除数和题目数）
     """
     html_dir = 'html'
     output_file = 'questions.json'
+    manifest_file = output_file + '.manifest'
     
-    all_questions = []
+    # 按文件名顺序合并所有页面的题目，保证每次生成的题库顺序一致；未变化的页面复用上次的解析结果
+    all_questions, stats = collect_questions(html_dir, manifest_file, workers, full_rebuild, engine)
     
-    # 遍历所有HTML文件
-    for filename in os.listdir(html_dir):
-        if filename.endswith('.html'):
-            file_path = os.path.join(html_dir, filename)
-            questions = parse_html_to_json(file_path)
-            all_questions.extend(questions)
+    # 去除重复捕捉或不同页面共享的重复题目
+    total_before = len(all_questions)
+    all_questions, summary = deduplicate_questions(all_questions)
+    summary_file = output_file + '.dedup.txt'
+    write_dedup_summary(summary, summary_file, total_before, len(all_questions))
     
     # 保存为JSON文件
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(all_questions, f, ensure_ascii=False, indent=2)
     
-    print(f"已成功提取{len(all_questions)}道题目，保存到{output_file}")
+    print(f"已成功提取{len(all_questions)}道题目（合并{total_before - len(all_questions)}道重复题目，详见{summary_file}），保存到{output_file}")
+    print(f"共{stats['files']}个页面：新解析{stats['parsed']}个，复用{stats['reused']}个，移除{stats['removed']}个已删除页面的题目")
+    stats['questions'] = len(all_questions)
+    return stats
 
 
 if __name__ == "__main__":
-    process_all_html_files()
+    parser = argparse.ArgumentParser(description='将html文件夹中捕捉的网页解析为题库questions.json')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='并行解析的进程数，1为逐个解析，0为使用全部CPU核心')
+    parser.add_argument('--full', action='store_true', help='忽略捕捉清单，重新解析全部页面')
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE,
+                        help='解析引擎：bs4为BeautifulSoup，lxml为更快的lxml引擎（解析结果相同）')
+    parser.add_argument('--check-parity', nargs='?', const='html', metavar='DIR',
+                        help='不生成题库，比较lxml引擎与BeautifulSoup对DIR（默认html）中每个页面的解析结果')
+    args = parser.parse_args()
+    if args.engine == 'lxml' and not LXML_AVAILABLE:
+        parser.error('lxml引擎需要安装lxml：pip install lxml')
+    if args.check_parity:
+        if not LXML_AVAILABLE:
+            parser.error('比较解析结果需要安装lxml：pip install lxml')
+        pages = sorted(os.path.join(args.check_parity, filename)
+                       for filename in os.listdir(args.check_parity) if filename.endswith('.html'))
+        result = check_engine_parity(pages)
+        print(f"共{result['pages']}个页面：{result['identical']}个结果相同，"
+              f"{len(result['fallback'])}个改用BeautifulSoup解析，{len(result['mismatched'])}个结果不同")
+        for file_path in result['mismatched']:
+            print(f"结果不同: {file_path}")
+        raise SystemExit(1 if result['mismatched'] else 0)
+    process_all_html_files(args.workers, args.full, args.engine)
@@ -0,0 +1,620 @@
+import os
+import re
+import sys
+import json
+import random
+import marshal
+import bisect
+import hashlib
+import threading
+from array import array
+from collections import namedtuple
+from collections.abc import Sequence
+
+from grading import build_answer_key
+from weighted_sampling import FenwickSampler
+from search_index import MultiSearchIndex, SearchIndex
+
+# 定义优先题型顺序
+TYPE_ORDER = ['单选题', '多选题', '判断题', '填空题', '简答题', '释义题']
+
+# 题库旁路缓存文件后缀及格式版本（格式变化时递增版本号使旧缓存失效）
+CACHE_SUFFIX = '.cache'
+CACHE_VERSION = 3
+
+# 流式加载时每次读取的字符数，以及每加载多少道题回调一次进度
+STREAM_CHUNK_SIZE = 64 * 1024
+PROGRESS_INTERVAL = 2000
+
+_WHITESPACE = ' \t\n\r'
+
+
+def _intern(value):
+    """驻留字符串，让重复出现的题型、章节标题和选项文本共享同一个对象"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _intern_tuple(values):
+    """将选项/答案列表转换为元素已驻留的元组"""
+    if not values:
+        return ()
+    return tuple(_intern(value) for value in values)
+
+
+class QuestionRecord:
+    """紧凑的题目记录：使用__slots__存储字段，并提供与dict兼容的访问方式
+    
+    值为None的字段视为不存在，与原始JSON中缺少该键时的dict行为一致；
+    不认识的额外字段存放在extra中；answer_key为加载时预先计算的标准化答案键，
+    fingerprint为加载时预先计算的题目指纹。
+    """
+    
+    FIELDS = ('id', 'title', 'type', 'content', 'options', 'correct_answer', 'analysis')
+    __slots__ = FIELDS + ('extra', 'answer_key', 'fingerprint')
+    
+    def __init__(self, id=None, title=None, type=None, content=None,
+                 options=None, correct_answer=None, analysis=None, extra=None):
+        self.id = id
+        self.title = _intern(title)
+        self.type = _intern(type)
+        self.content = content
+        self.options = _intern_tuple(options) if options is not None else None
+        self.correct_answer = _intern_tuple(correct_answer) if correct_answer is not None else None
+        self.analysis = analysis
+        self.extra = extra or None
+        self.answer_key = build_answer_key(self.type, self.correct_answer)
+        self.fingerprint = _content_fingerprint(self)
+    
+    @classmethod
+    def from_dict(cls, data):
+        """从JSON解析出的dict构建题目记录"""
+        extra = None
+        for key in data:
+            if key not in cls.FIELDS:
+                if extra is None:
+                    extra = {}
+                extra[key] = data[key]
+        return cls(
+            data.get('id'), data.get('title'), data.get('type'), data.get('content'),
+            data.get('options'), data.get('correct_answer'), data.get('analysis'), extra
+        )
+    
+    def to_dict(self):
+        """转换为普通dict，用于JSON序列化"""
+        result = {}
+        for key, value in self.items():
+            result[key] = list(value) if isinstance(value, tuple) else value
+        return result
+    
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        if key in ('options', 'correct_answer'):
+            setattr(self, key, _intern_tuple(value) if value is not None else None)
+        elif key in ('title', 'type'):
+            setattr(self, key, _intern(value))
+        elif key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+        
+        # 题型或正确答案变化时重新计算答案键
+        if key in ('type', 'correct_answer'):
+            self.answer_key = build_answer_key(self.type, self.correct_answer)
+        # 题型、题干或选项变化时重新计算指纹
+        if key in ('type', 'content', 'options'):
+            self.fingerprint = _content_fingerprint(self)
+    
+    def __contains__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key) is not None
+        return bool(self.extra) and key in self.extra
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def keys(self):
+        return [key for key, _ in self.items()]
+    
+    def items(self):
+        items = [(key, getattr(self, key)) for key in self.FIELDS if getattr(self, key) is not None]
+        if self.extra:
+            items.extend(self.extra.items())
+        return items
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __len__(self):
+        return len(self.items())
+    
+    def to_row(self):
+        """转换为只包含内置类型的元组，用于写入二进制缓存"""
+        return (self.id, self.title, self.type, self.content,
+                self.options, self.correct_answer, self.analysis, self.extra, self.answer_key,
+                self.fingerprint)
+    
+    @classmethod
+    def from_row(cls, row):
+        """从缓存中的元组快速还原题目记录（缓存中的字符串已共享，无需再次驻留）"""
+        record = object.__new__(cls)
+        (record.id, record.title, record.type, record.content,
+         record.options, record.correct_answer, record.analysis, record.extra, record.answer_key,
+         record.fingerprint) = row
+        return record
+    
+    def __repr__(self):
+        return f"QuestionRecord(type={self.type!r}, content={self.content!r})"
+
+
+def normalize_question_type(question):
+    """自动识别选择题类型：根据正确答案数量将选择题转换为单选题或多选题"""
+    if question.get('type') == '选择题':
+        correct_answers = question.get('correct_answer', [])
+        # 过滤掉空答案
+        correct_answers = [ans for ans in correct_answers if ans.strip()]
+        
+        if len(correct_answers) > 1:
+            question['type'] = '多选题'
+        else:
+            question['type'] = '单选题'
+
+
+def _normalize_text(value):
+    """规范化文本：合并连续空白并去除首尾空白"""
+    return re.sub(r'\s+', ' ', value).strip() if isinstance(value, str) else str(value)
+
+
+def question_fingerprint(question):
+    """题目指纹：由题型、规范化后的题干和选项计算的内容哈希，题目记录直接使用加载时计算好的指纹"""
+    fingerprint = getattr(question, 'fingerprint', None)
+    if fingerprint is not None:
+        return fingerprint
+    return _content_fingerprint(question)
+
+
+def _content_fingerprint(question):
+    digest = hashlib.blake2b(digest_size=8)
+    parts = [question.get('type') or '', question.get('content') or '']
+    parts.extend(question.get('options') or ())
+    for part in parts:
+        digest.update(_normalize_text(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def build_type_index(questions):
+    """构建题型索引：题型 -> 题目下标数组，同时返回各题型数量统计"""
+    type_index = {}
+    for i, question in enumerate(questions):
+        q_type = question['type']
+        bucket = type_index.get(q_type)
+        if bucket is None:
+            bucket = type_index[q_type] = array('I')
+        bucket.append(i)
+    
+    stats = {q_type: len(bucket) for q_type, bucket in type_index.items()}
+    return type_index, stats
+
+
+def sample_indices_by_type(questions, type_index, type_counts, rng=random, weight_fn=None, weighted=None):
+    """根据各题型数量从题型索引中随机抽取题目，返回抽中题目的下标，不复制题型分组
+    
+    提供weighted（WeightedSamplerCache.sampler返回的抽样函数）时复用缓存的树状数组按权重无放回抽取，
+    抽取k道题为O(k log n)；提供weight_fn时每次重新计算该题型全部题目的权重再抽取。
+    """
+    selected_indices = []
+    
+    # 先处理优先顺序中的题型，再处理其他用户选择了的题型
+    ordered_types = [q_type for q_type in TYPE_ORDER if q_type in type_counts]
+    ordered_types += [q_type for q_type in type_counts if q_type not in TYPE_ORDER]
+    
+    for q_type in ordered_types:
+        count = type_counts[q_type]
+        bucket = type_index.get(q_type)
+        if count <= 0 or not bucket:
+            continue
+        if weighted is not None:
+            picked = weighted(questions, bucket, count, rng)
+        elif weight_fn is None:
+            # 直接在下标数组上抽样
+            picked = rng.sample(bucket, min(count, len(bucket)))
+        else:
+            sampler = FenwickSampler([weight_fn(questions[i]) for i in bucket])
+            picked = [bucket[j] for j in sampler.sample(count, rng)]
+        selected_indices.extend(picked)
+    
+    return selected_indices
+
+
+def sample_by_type(questions, type_index, type_counts, rng=random, weight_fn=None, weighted=None):
+    """根据各题型数量从题型索引中随机抽取题目"""
+    indices = sample_indices_by_type(questions, type_index, type_counts, rng, weight_fn, weighted)
+    return [questions[i] for i in indices]
+
+
+def iter_json_array(file_path, chunk_size=STREAM_CHUNK_SIZE):
+    """流式解析顶层为数组的JSON文件，逐个产出数组元素
+    
+    基于JSONDecoder.raw_decode按块解码，不会一次性读入整个文件。
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        # 解析状态：start（等待"["）、value（等待元素或"]"）、first（等待第一个元素或"]"）、separator（等待","或"]"）
+        state = 'start'
+        
+        while True:
+            # 跳过空白
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            
+            if pos >= len(buffer):
+                if eof:
+                    raise json.JSONDecodeError("JSON数组未正常结束", buffer, pos)
+                buffer = f.read(chunk_size)
+                pos = 0
+                if not buffer:
+                    eof = True
+                continue
+            
+            char = buffer[pos]
+            if state == 'start':
+                if char != '[':
+                    raise json.JSONDecodeError("题库文件顶层必须是JSON数组", buffer, pos)
+                state = 'first'
+                pos += 1
+                continue
+            
+            if state == 'separator':
+                if char == ',':
+                    state = 'value'
+                    pos += 1
+                    continue
+                if char == ']':
+                    return
+                raise json.JSONDecodeError("数组元素之间缺少逗号", buffer, pos)
+            
+            if state == 'first' and char == ']':
+                return
+            
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # 数字可能被块边界截断（如"1."、"1.5e"只解码出前半部分），值之后的第一个非空白字符
+                # 不是","或"]"（包括已到缓冲区末尾）时需要继续读取后重新解码
+                if not eof:
+                    next_pos = end
+                    while next_pos < len(buffer) and buffer[next_pos] in _WHITESPACE:
+                        next_pos += 1
+                    if next_pos >= len(buffer) or buffer[next_pos] not in ',]':
+                        raise ValueError("incomplete")
+            except ValueError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    eof = True
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            
+            yield item
+            state = 'separator'
+            pos = end
+            # 已解码的内容较多时丢弃，保持缓冲区较小
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def _file_digest(file_path):
+    """计算文件内容哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_key(file_path):
+    """根据源文件路径、大小、修改时间和内容哈希生成缓存键"""
+    stat = os.stat(file_path)
+    return (CACHE_VERSION, marshal.version, os.path.abspath(file_path),
+            stat.st_size, stat.st_mtime_ns, _file_digest(file_path))
+
+
+class QuestionBank:
+    """已加载的题库：题目记录、题型索引和各题型数量统计"""
+    
+    def __init__(self, questions, type_index=None, stats=None, path=None):
+        self.questions = questions
+        if type_index is None or stats is None:
+            type_index, stats = build_type_index(questions)
+        self.type_index = type_index
+        self.stats = stats
+        self.path = path
+        # 加载时源文件的(大小, 修改时间)，用于判断题库文件是否已变化
+        self.source_stat = None
+        self._search_index = None
+        self._search_lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.questions)
+    
+    @property
+    def search_index(self):
+        """题库的全文搜索索引，首次访问时构建（并发访问时只构建一次），之后一直复用"""
+        if self._search_index is None:
+            with self._search_lock:
+                if self._search_index is None:
+                    self._search_index = SearchIndex(self.questions)
+        return self._search_index
+    
+    @property
+    def has_search_index(self):
+        """全文搜索索引是否已经构建"""
+        return self._search_index is not None
+    
+    def is_stale(self):
+        """源文件自加载以来是否已被修改或删除"""
+        if self.path is None or self.source_stat is None:
+            return False
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return True
+        return (stat.st_size, stat.st_mtime_ns) != self.source_stat
+    
+    @classmethod
+    def load(cls, file_path, use_cache=True, on_progress=None):
+        """加载题库文件，优先使用旁路缓存（如questions.json.cache），缓存过期时透明重建
+        
+        缓存未命中时流式解析源文件；on_progress(已加载题数, 各题型数量)会在加载过程中被定期调用。
+        """
+        cache_path = file_path + CACHE_SUFFIX
+        stat = os.stat(file_path)
+        key = _cache_key(file_path) if use_cache else None
+        
+        bank = cls._read_cache(cache_path, key, file_path) if use_cache else None
+        if bank is None:
+            bank = cls._load_stream(file_path, on_progress)
+            if use_cache:
+                bank._write_cache(cache_path, key)
+        
+        bank.source_stat = (stat.st_size, stat.st_mtime_ns)
+        return bank
+    
+    @classmethod
+    def _load_stream(cls, file_path, on_progress=None):
+        """流式加载题库：逐题规范化并增量更新题型索引和统计"""
+        questions = []
+        type_index = {}
+        stats = {}
+        
+        for data in iter_json_array(file_path):
+            question = QuestionRecord.from_dict(data)
+            normalize_question_type(question)
+            
+            q_type = question['type']
+            bucket = type_index.get(q_type)
+            if bucket is None:
+                bucket = type_index[q_type] = array('I')
+                stats[q_type] = 0
+            bucket.append(len(questions))
+            stats[q_type] += 1
+            questions.append(question)
+            
+            if on_progress and len(questions) % PROGRESS_INTERVAL == 0:
+                on_progress(len(questions), stats)
+        
+        if on_progress:
+            on_progress(len(questions), stats)
+        return cls(questions, type_index, stats, path=file_path)
+    
+    @classmethod
+    def _read_cache(cls, cache_path, key, file_path):
+        """读取旁路缓存，缓存不存在、已过期或损坏时返回None"""
+        try:
+            with open(cache_path, 'rb') as f:
+                data = marshal.loads(f.read())
+            if data.get('key') != key:
+                return None
+            # 按列存储比按行存储解码更快
+            questions = [QuestionRecord.from_row(row) for row in zip(*data['columns'])]
+            type_index = {}
+            for q_type, raw in data['index'].items():
+                bucket = array('I')
+                bucket.frombytes(raw)
+                type_index[q_type] = bucket
+            return cls(questions, type_index, data['stats'], path=file_path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"题库缓存无效，将重新生成: {e}")
+            return None
+    
+    def _write_cache(self, cache_path, key):
+        """写入旁路缓存，先写临时文件再原子替换；写入失败不影响加载"""
+        data = {
+            'key': key,
+            'columns': [list(column) for column in zip(*(q.to_row() for q in self.questions))],
+            'index': {q_type: bucket.tobytes() for q_type, bucket in self.type_index.items()},
+            'stats': self.stats
+        }
+        # 临时文件名区分进程和线程，多个线程同时重建同一个缓存时不会互相覆盖
+        tmp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(marshal.dumps(data))
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"写入题库缓存失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class ConcatIndex(Sequence):
+    """多个下标数组首尾相接的只读视图，每段下标加上该段在虚拟题库中的偏移量"""
+    
+    def __init__(self, parts):
+        # parts为[(偏移量, 下标数组), ...]，只保存引用，不复制下标数组
+        self.parts = [(offset, bucket) for offset, bucket in parts if len(bucket)]
+        self.starts = []
+        total = 0
+        for _, bucket in self.parts:
+            self.starts.append(total)
+            total += len(bucket)
+        self.length = total
+    
+    def __len__(self):
+        return self.length
+    
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError(i)
+        part = bisect.bisect_right(self.starts, i) - 1
+        offset, bucket = self.parts[part]
+        return offset + bucket[i - self.starts[part]]
+
+
+class MultiBankView(Sequence):
+    """由多个题库文件组成的虚拟题库
+    
+    按文件分段保存各自的QuestionBank，题目下标和题型索引通过偏移量映射到各分段，
+    不会把所有题目拼接成新的列表；重新加载某个文件时只重建对应分段。
+    """
+    
+    def __init__(self, banks):
+        self.segments = list(banks)
+        self._search_lock = threading.Lock()
+        self._rebuild_view()
+    
+    @classmethod
+    def load(cls, file_paths, use_cache=True):
+        """加载多个题库文件组成虚拟题库"""
+        return cls([QuestionBank.load(path, use_cache=use_cache) for path in file_paths])
+    
+    def _rebuild_view(self):
+        """根据各分段重建偏移量、合并题型索引和统计，开销只与分段数和题型数有关"""
+        self.offsets = []
+        total = 0
+        for bank in self.segments:
+            self.offsets.append(total)
+            total += len(bank)
+        self.length = total
+        
+        parts_by_type = {}
+        self.stats = {}
+        for offset, bank in zip(self.offsets, self.segments):
+            for q_type, bucket in bank.type_index.items():
+                parts_by_type.setdefault(q_type, []).append((offset, bucket))
+                self.stats[q_type] = self.stats.get(q_type, 0) + len(bucket)
+        self.type_index = {q_type: ConcatIndex(parts) for q_type, parts in parts_by_type.items()}
+        self._search_index = None
+    
+    @property
+    def search_index(self):
+        """组合各分段的全文搜索索引，首次访问时构建，未变化的分段直接复用已构建的索引"""
+        if self._search_index is None:
+            with self._search_lock:
+                if self._search_index is None:
+                    self._search_index = MultiSearchIndex(
+                        [(offset, bank.search_index) for offset, bank in zip(self.offsets, self.segments)]
+                    )
+        return self._search_index
+    
+    @property
+    def has_search_index(self):
+        return self._search_index is not None
+    
+    @property
+    def questions(self):
+        return self
+    
+    @property
+    def paths(self):
+        return [bank.path for bank in self.segments]
+    
+    def __len__(self):
+        return self.length
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.length))]
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError(i)
+        segment = bisect.bisect_right(self.offsets, i) - 1
+        return self.segments[segment].questions[i - self.offsets[segment]]
+    
+    def __iter__(self):
+        for bank in self.segments:
+            yield from bank.questions
+    
+    def with_segment_reloaded(self, file_path, use_cache=True, loader=None):
+        """返回重新加载了某个成员文件的新视图，其余分段直接共享；file_path不是成员文件时返回None
+        
+        原视图保持不变，正在使用原视图的调用方不会看到重建到一半的状态。
+        loader(路径)用于加载题库（如BankCache.load），默认直接调用QuestionBank.load。
+        """
+        loader = loader or (lambda path: QuestionBank.load(path, use_cache=use_cache))
+        target = os.path.abspath(file_path)
+        for i, bank in enumerate(self.segments):
+            if os.path.abspath(bank.path) == target:
+                segments = list(self.segments)
+                segments[i] = loader(bank.path)
+                return MultiBankView(segments)
+        return None
+    
+    def refreshed(self, use_cache=True, loader=None):
+        """返回只重新加载了已变化成员文件的新视图，未变化的分段直接共享；没有文件变化时返回自身"""
+        loader = loader or (lambda path: QuestionBank.load(path, use_cache=use_cache))
+        segments = [loader(bank.path) if bank.is_stale() else bank for bank in self.segments]
+        if all(new is old for new, old in zip(segments, self.segments)):
+            return self
+        return MultiBankView(segments)
+
+
+class BankSnapshot(namedtuple('BankSnapshot', ['questions', 'type_index', 'stats', 'bank', 'path'])):
+    """已加载题库的只读快照：请求开始时取得一次引用，之后即使题库被重新加载也始终看到同一份完整数据"""
+    
+    __slots__ = ()
+    
+    @property
+    def search_index(self):
+        """题库的全文搜索索引，首次搜索时构建"""
+        return self.bank.search_index if self.bank is not None else None
+
+
+EMPTY_SNAPSHOT = BankSnapshot((), {}, {}, None, None)
+
+
+def snapshot_of(bank, path):
+    """为加载完成的题库（单个题库或虚拟题库）生成快照，搜索索引不在此时构建"""
+    return BankSnapshot(bank.questions, bank.type_index, bank.stats, bank, path)
+
+
+def build_search_index_in_background(bank):
+    """在后台线程中构建题库的全文搜索索引，加载题库时无需等待，首次搜索时通常已经建好"""
+    if bank.has_search_index:
+        return
+    threading.Thread(target=lambda: bank.search_index, daemon=True).start()
@@ -0,0 +1,184 @@
+import re
+import math
+import bisect
+from array import array
+from collections import namedtuple
+
+# 参与索引的字段及其权重：题干命中比选项、解析命中更重要
+FIELD_WEIGHTS = (('content', 3), ('options', 2), ('analysis', 1))
+
+# 默认每页结果数及每页结果数上限
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# 单个词元在一道题中的累计权重上限（倒排表中按无符号短整型保存）
+_MAX_TERM_WEIGHT = 0xFFFF
+
+# ASCII单词与连续的中日韩汉字
+_TOKEN_PATTERN = re.compile('[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+# 搜索结果：命中总数以及当前页的(题目下标, 得分)列表
+SearchResult = namedtuple('SearchResult', ['total', 'hits'])
+
+
+def tokenize(text):
+    """将文本切分为词元：ASCII单词整体作为一个词元，汉字按相邻二字切分，单独出现的汉字保留为单字"""
+    tokens = []
+    for run in _TOKEN_PATTERN.findall(text.lower()):
+        if run[0] < '\u0080' or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _field_text(question, field):
+    value = question.get(field)
+    if not value:
+        return ''
+    if isinstance(value, str):
+        return value
+    return ' '.join(str(item) for item in value)
+
+
+def _is_single_cjk(token):
+    return len(token) == 1 and token >= '\u0080'
+
+
+class SearchIndex:
+    """单个题库的倒排索引：词元 -> (题目下标数组, 权重数组)
+    
+    在加载题库时构建一次，之后每次搜索只需读取查询词元对应的倒排表，无需扫描全部题目。
+    """
+    
+    def __init__(self, questions):
+        self.size = len(questions)
+        postings = {}
+        for doc_id, question in enumerate(questions):
+            counts = {}
+            for field, weight in FIELD_WEIGHTS:
+                for token in tokenize(_field_text(question, field)):
+                    counts[token] = counts.get(token, 0) + weight
+            for token, weight in counts.items():
+                entry = postings.get(token)
+                if entry is None:
+                    entry = postings[token] = (array('I'), array('H'))
+                entry[0].append(doc_id)
+                entry[1].append(min(weight, _MAX_TERM_WEIGHT))
+        self.postings = postings
+        # 单个汉字 -> 包含该字的词元、按字典序排列的ASCII词元，首次用到时再构建
+        self._char_tokens = None
+        self._ascii_tokens = None
+    
+    def expand_token(self, token, prefix=False):
+        """查询词元在索引中对应的词元
+        
+        单个汉字扩展为所有包含该字的词元；prefix为True时ASCII词元扩展为所有以其开头的词元。
+        """
+        if prefix and not _is_single_cjk(token) and token < '\u0080':
+            if self._ascii_tokens is None:
+                self._ascii_tokens = sorted(key for key in self.postings if key < '\u0080')
+            keys = self._ascii_tokens
+            start = bisect.bisect_left(keys, token)
+            end = bisect.bisect_left(keys, token + '\u007f')
+            return keys[start:end]
+        if not _is_single_cjk(token):
+            return (token,) if token in self.postings else ()
+        if self._char_tokens is None:
+            char_tokens = {}
+            for key in self.postings:
+                if key[0] >= '\u0080':
+                    for char in set(key):
+                        char_tokens.setdefault(char, []).append(key)
+            self._char_tokens = char_tokens
+        return self._char_tokens.get(token, ())
+    
+    def term_postings(self, token, prefix=False):
+        """查询词元对应的倒排表列表[(题目下标数组, 权重数组), ...]，每个下标数组都按题目下标升序排列"""
+        return [self.postings[key] for key in self.expand_token(token, prefix)]
+    
+    def search(self, query, page=1, page_size=DEFAULT_PAGE_SIZE):
+        """搜索题库，返回按相关度排序的分页结果"""
+        return _search([(0, self)], self.size, query, page, page_size)
+
+
+class MultiSearchIndex:
+    """多个题库的组合索引：复用各题库自己的索引，按偏移量换算为虚拟题库中的下标"""
+    
+    def __init__(self, parts):
+        # parts为[(偏移量, SearchIndex), ...]
+        self.parts = parts
+        self.size = sum(index.size for _, index in parts)
+    
+    def search(self, query, page=1, page_size=DEFAULT_PAGE_SIZE):
+        """搜索全部题库，返回按相关度排序的分页结果"""
+        return _search(self.parts, self.size, query, page, page_size)
+
+
+def _document_count(postings):
+    """命中若干倒排表中任意一个的题目数"""
+    if len(postings) == 1:
+        return len(postings[0][0])
+    return len(set().union(*(doc_ids for doc_ids, _ in postings)))
+
+
+def _weight_at(postings, doc_id):
+    """题目在若干倒排表中的最大权重，均未命中时返回0；下标数组有序，按二分查找定位"""
+    best = 0
+    for doc_ids, weights in postings:
+        i = bisect.bisect_left(doc_ids, doc_id)
+        if i < len(doc_ids) and doc_ids[i] == doc_id and weights[i] > best:
+            best = weights[i]
+    return best
+
+
+def _search(parts, size, query, page, page_size):
+    """在若干分段索引上执行查询：所有查询词元都命中的题目才算结果，按TF-IDF得分排序"""
+    page = max(1, int(page))
+    page_size = min(max(1, int(page_size)), MAX_PAGE_SIZE)
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return SearchResult(0, [])
+    # 边输入边搜索时，查询末尾尚未输入完整的ASCII单词按前缀匹配
+    prefix_token = tokens[-1] if query[-1:].isalnum() and tokens[-1] < '\u0080' else None
+    
+    # 文档频率按全部分段合计，保证多个题库之间的得分可比
+    part_postings = []
+    document_frequency = [0] * len(tokens)
+    for offset, index in parts:
+        term_postings = [index.term_postings(token, token == prefix_token) for token in tokens]
+        for i, postings in enumerate(term_postings):
+            document_frequency[i] += _document_count(postings)
+        part_postings.append((offset, term_postings))
+    if not all(document_frequency):
+        return SearchResult(0, [])
+    idf = [math.log(1.0 + size / df) for df in document_frequency]
+    
+    ranked = []
+    for offset, term_postings in part_postings:
+        # 只展开倒排表最短的词元，其余词元逐个对候选题目在有序下标数组中二分查找
+        lengths = [sum(len(doc_ids) for doc_ids, _ in postings) for postings in term_postings]
+        order = sorted(range(len(tokens)), key=lengths.__getitem__)
+        first = order[0]
+        candidates = {}
+        for doc_ids, weights in term_postings[first]:
+            for doc_id, weight in zip(doc_ids, weights):
+                if weight > candidates.get(doc_id, 0):
+                    candidates[doc_id] = weight
+        candidates = {doc_id: weight * idf[first] for doc_id, weight in candidates.items()}
+        for i in order[1:]:
+            if not candidates:
+                break
+            postings, term_idf = term_postings[i], idf[i]
+            matched = {}
+            for doc_id, score in candidates.items():
+                weight = _weight_at(postings, doc_id)
+                if weight:
+                    matched[doc_id] = score + weight * term_idf
+            candidates = matched
+        ranked.extend((-score, offset + doc_id) for doc_id, score in candidates.items())
+    ranked.sort()
+    
+    start = (page - 1) * page_size
+    hits = [(doc_id, round(-score, 4)) for score, doc_id in ranked[start:start + page_size]]
+    return SearchResult(len(ranked), hits)
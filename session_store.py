@@ -0,0 +1,166 @@
+import time
+import secrets
+import threading
+from array import array
+from collections import OrderedDict
+
+# 会话令牌的Cookie名称和请求头名称（跨域客户端无法使用Cookie时可通过请求头传递）
+SESSION_COOKIE = 'tg_session'
+SESSION_HEADER = 'X-Session-Token'
+
+# 默认最多保留的会话数，以及会话闲置多久后过期（秒）
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_IDLE_TTL = 2 * 60 * 60
+
+
+class ExamSession:
+    """一名考生的答题会话
+    
+    试卷只保存题目在共享题库中的下标，作答内容保存为元组，已查看答案的标记保存在bytearray中，
+    每个会话只占用很少的内存。会话引用抽题时的题库，重新加载题库不会影响进行中的答题。
+    paper_id为试卷编号，每次抽取新试卷时递增；answers_version为该试卷最近一次批量保存的版本号，
+    批量保存时两者一起用于丢弃重复、迟到或属于上一份试卷的请求；
+    wrong_recorded标记已计入做题记录的错题，提交和生成错题本都会记录错题，每道题只计入一次。
+    """
+    
+    __slots__ = ('token', 'bank', 'paper', 'paper_id', 'answers', 'answers_version', 'viewed',
+                 'wrong_recorded', 'last_access')
+    
+    def __init__(self, token):
+        self.token = token
+        self.bank = ()
+        self.paper = array('I')
+        self.paper_id = 0
+        self.answers = {}
+        self.answers_version = 0
+        self.viewed = bytearray()
+        self.wrong_recorded = bytearray()
+        self.last_access = 0.0
+    
+    def start(self, bank, indices):
+        """开始新的答题：保存题库引用和抽中题目的下标，清空作答记录"""
+        self.bank = bank
+        self.paper = array('I', indices)
+        self.paper_id += 1
+        self.answers = {}
+        self.answers_version = 0
+        self.viewed = bytearray(len(self.paper))
+        self.wrong_recorded = bytearray(len(self.paper))
+    
+    def __len__(self):
+        return len(self.paper)
+    
+    def has_question(self, index):
+        return 0 <= index < len(self.paper)
+    
+    def question(self, index):
+        """试卷中第index道题"""
+        return self.bank[self.paper[index]]
+    
+    def questions(self):
+        """按试卷顺序返回全部题目"""
+        bank = self.bank
+        return [bank[i] for i in self.paper]
+    
+    def set_answer(self, index, answer):
+        self.answers[index] = tuple(answer) if answer else ()
+    
+    def apply_answers(self, answers, version, paper_id):
+        """批量保存作答：answers为{题目序号: 答案}，试卷编号不是当前试卷或版本号不大于已保存的版本时不做修改并返回False"""
+        if paper_id != self.paper_id or version <= self.answers_version:
+            return False
+        for index, answer in answers.items():
+            self.set_answer(index, answer)
+        self.answers_version = version
+        return True
+    
+    def get_answer(self, index):
+        return list(self.answers.get(index, ()))
+    
+    def claim_wrong(self, indices):
+        """返回尚未计入做题记录的错题序号并将其标记为已计入"""
+        claimed = []
+        for index in indices:
+            if self.has_question(index) and not self.wrong_recorded[index]:
+                self.wrong_recorded[index] = 1
+                claimed.append(index)
+        return claimed
+    
+    def mark_viewed(self, index):
+        self.viewed[index] = 1
+    
+    def is_viewed(self, index):
+        return bool(self.viewed[index])
+
+
+class SessionStore:
+    """按令牌保存答题会话，数量超过上限时淘汰最久未访问的会话，闲置超时的会话自动过期
+    
+    会话按最近访问顺序保存在OrderedDict中，过期清理只需从最旧的一端检查，开销与过期会话数成正比。
+    """
+    
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, idle_ttl=DEFAULT_IDLE_TTL, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+        self.expired = 0
+    
+    def __len__(self):
+        return len(self.sessions)
+    
+    def _expire(self, now):
+        while self.sessions:
+            token, session = next(iter(self.sessions.items()))
+            if now - session.last_access <= self.idle_ttl:
+                break
+            del self.sessions[token]
+            self.expired += 1
+    
+    def get(self, token):
+        """获取令牌对应的会话并刷新访问时间，会话不存在或已过期时返回None"""
+        if not token:
+            return None
+        with self.lock:
+            now = self.clock()
+            self._expire(now)
+            session = self.sessions.get(token)
+            if session is None:
+                return None
+            session.last_access = now
+            self.sessions.move_to_end(token)
+            return session
+    
+    def create(self):
+        """创建新会话，超过数量上限时淘汰最久未访问的会话"""
+        with self.lock:
+            now = self.clock()
+            self._expire(now)
+            token = secrets.token_urlsafe(18)
+            while token in self.sessions:
+                token = secrets.token_urlsafe(18)
+            session = ExamSession(token)
+            session.last_access = now
+            self.sessions[token] = session
+            self.created += 1
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evicted += 1
+            return session
+    
+    def remove(self, token):
+        with self.lock:
+            self.sessions.pop(token, None)
+    
+    def stats(self):
+        """会话统计：当前会话数、累计创建数、因数量上限淘汰数和闲置过期数"""
+        with self.lock:
+            return {
+                'active': len(self.sessions),
+                'created': self.created,
+                'evicted': self.evicted,
+                'expired': self.expired
+            }
@@ -0,0 +1,157 @@
+import os
+import re
+import gzip
+import time
+import hashlib
+import mimetypes
+import threading
+
+# 带内容哈希的资源地址可以永久缓存，内容变化后地址随之变化
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# 入口页面和未带哈希的地址每次都向服务器确认（内容未变时返回304）
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# 入口页面，其中引用的资源地址会改写为带哈希的地址
+ENTRY_PAGE = 'index.html'
+
+# 默认每隔多少秒最多检查一次目录中的文件是否变化
+DEFAULT_CHECK_INTERVAL = 2.0
+
+# 需要预先压缩的文本类资源
+_COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+# 入口页面中引用同目录资源的src/href属性
+_REFERENCE_PATTERN = re.compile(r'''((?:src|href)\s*=\s*["'])([^"':/?#]+)(["'])''')
+
+
+def accepts_gzip(accept_encoding):
+    """根据Accept-Encoding请求头判断客户端是否接受gzip（q=0表示明确拒绝）"""
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if coding.strip().lower() not in ('gzip', '*'):
+            continue
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class StaticAsset:
+    """一个静态资源：原始内容、预先压缩的内容、内容哈希和类型"""
+    
+    __slots__ = ('name', 'body', 'gzip_body', 'digest', 'mimetype', 'stat')
+    
+    def __init__(self, name, body, mimetype, stat):
+        self.name = name
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        self.mimetype = mimetype
+        self.stat = stat
+        self.gzip_body = None
+        if mimetype.startswith(_COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.gzip_body = compressed
+    
+    @property
+    def hashed_name(self):
+        """带内容哈希的文件名，如 app.js -> app.3f2a1b9c0d4e.js"""
+        root, ext = os.path.splitext(self.name)
+        return f'{root}.{self.digest}{ext}'
+    
+    def etag(self, encoding=None):
+        # 压缩与未压缩的内容不同，使用不同的ETag
+        return f'{self.digest}-{encoding}' if encoding else self.digest
+    
+    def select(self, accept_encoding):
+        """按Accept-Encoding选择返回的内容，返回(内容, 编码)，编码为None表示未压缩"""
+        if self.gzip_body is not None and accepts_gzip(accept_encoding):
+            return self.gzip_body, 'gzip'
+        return self.body, None
+
+
+class StaticAssets:
+    """web目录下静态资源的发布流程
+    
+    启动时读取一次全部资源，计算内容哈希并预先gzip压缩；入口页面中引用的资源改写为带哈希的地址，
+    这些地址可以被浏览器永久缓存，入口页面本身每次向服务器确认。请求时每隔check_interval秒最多检查一次
+    目录中的文件是否变化，变化后自动重新生成；check_interval为None时启动后不再检查。
+    """
+    
+    def __init__(self, directory, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.assets = {}  # 文件名 -> StaticAsset
+        self.hashed = {}  # 带哈希的文件名 -> StaticAsset
+        self.last_check = time.monotonic()
+        self.build()
+    
+    def _scan(self):
+        """目录中文件的(大小, 修改时间)，用于判断是否需要重新生成"""
+        stats = {}
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if os.path.isfile(path):
+                    st = os.stat(path)
+                    stats[name] = (st.st_size, st.st_mtime_ns)
+        return stats
+    
+    def build(self):
+        """读取、压缩并计算全部资源的哈希，然后改写入口页面中的资源地址"""
+        stats = self._scan()
+        assets = {}
+        for name, stat in stats.items():
+            if name == ENTRY_PAGE:
+                continue
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                body = f.read()
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            assets[name] = StaticAsset(name, body, mimetype, stat)
+        
+        if ENTRY_PAGE in stats:
+            with open(os.path.join(self.directory, ENTRY_PAGE), 'r', encoding='utf-8') as f:
+                page = f.read()
+            
+            def rewrite(match):
+                asset = assets.get(match.group(2))
+                if asset is None:
+                    return match.group(0)
+                return f'{match.group(1)}{asset.hashed_name}{match.group(3)}'
+            
+            page = _REFERENCE_PATTERN.sub(rewrite, page)
+            assets[ENTRY_PAGE] = StaticAsset(ENTRY_PAGE, page.encode('utf-8'), 'text/html', stats[ENTRY_PAGE])
+        
+        with self.lock:
+            self.assets = assets
+            self.hashed = {asset.hashed_name: asset for asset in assets.values()}
+    
+    def _is_stale(self):
+        current = {name: asset.stat for name, asset in self.assets.items()}
+        return self._scan() != current
+    
+    def _check_due(self):
+        """距上次检查是否已超过check_interval秒，同一时间只有一个请求负责检查"""
+        if self.check_interval is None:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_check < self.check_interval:
+                return False
+            self.last_check = now
+            return True
+    
+    def lookup(self, path):
+        """按请求路径查找资源，返回(资源, 是否为带哈希的地址)，找不到时返回(None, False)"""
+        if self._check_due() and self._is_stale():
+            self.build()
+        with self.lock:
+            asset = self.hashed.get(path)
+            if asset is not None:
+                return asset, True
+            return self.assets.get(path), False
@@ -7,6 +7,7 @@ createApp({
             filePath: 'questions.json',
             availableFiles: [],
             stats: null,
+            loadProgress: null, // 题库加载进度（加载大题库时显示部分统计）
             error: '',
             typeCounts: {},
             availableTypes: [],
@@ -33,7 +34,17 @@ createApp({
             autoShowAnswer: false, // 选择答案后自动显示答案
             localQuestions: [], // 本地存储的题目数据
             localAnswers: {}, // 本地存储的用户答案
-            localViewedAnswers: {} // 本地存储的已查看答案状态
+            localViewedAnswers: {}, // 本地存储的已查看答案状态
+            leanMode: true, // 精简模式：抽题时只获取答题卡骨架，题目内容按窗口加载，答案不提前下发
+            questionWindow: 20, // 每次加载的题数
+            wireFormat: 'json', // 题目列表的传输格式：json-普通JSON（默认），columnar-共享字符串表加按列存储（可选）
+            pendingWindows: {}, // 正在加载的窗口（起始位置 -> Promise）
+            answerBatch: {}, // 尚未提交到服务器的答案（题目序号 -> 答案）
+            answerVersion: 0, // 批量保存答案的版本号，每份试卷从0开始递增
+            paperId: null, // 当前试卷的编号（由抽题接口返回），批量保存时一并提交，服务器据此拒绝上一份试卷的答案
+            answerFlush: null, // 正在进行的批量保存
+            answerTimer: null, // 延迟批量保存的定时器
+            answerSaveDelay: 800 // 答案变化后等待多久再批量保存（毫秒）
         };
     },
     computed: {
@@ -55,6 +66,9 @@ createApp({
                 const user_answer = this.localAnswers[i] || [];
                 const correct_answer = question.correct_answer;
                 
+                // 精简模式下尚未查看答案的题目没有正确答案，不参与统计
+                if (!correct_answer) continue;
+                
                 // 只有当用户已经作答时才进行统计
                 const is_answered = user_answer.length > 0 && user_answer.some(ans => ans.trim() !== '');
                 if (is_answered) {
@@ -88,6 +102,9 @@ createApp({
                 const user_answer = this.localAnswers[i] || [];
                 const correct_answer = question.correct_answer;
                 
+                // 精简模式下尚未查看答案的题目没有正确答案，不参与统计
+                if (!correct_answer) continue;
+                
                 // 只有当用户已经作答时才进行统计
                 const is_answered = user_answer.length > 0 && user_answer.some(ans => ans.trim() !== '');
                 if (is_answered) {
@@ -165,6 +182,8 @@ createApp({
         async loadQuestions() {
             /* 加载题库 */
             this.error = '';
+            // 加载过程中轮询加载进度，显示已读取部分的统计
+            const progressTimer = setInterval(this.pollLoadProgress, 300);
             try {
                 const response = await fetch('/api/load_questions', {
                     method: 'POST',
@@ -192,6 +211,22 @@ createApp({
                 }
             } catch (error) {
                 this.error = `加载失败: ${error.message}`;
+            } finally {
+                clearInterval(progressTimer);
+                this.loadProgress = null;
+            }
+        },
+        
+        async pollLoadProgress() {
+            /* 获取题库加载进度 */
+            try {
+                const response = await fetch('/api/load_progress');
+                const data = await response.json();
+                if (data.success && data.loading) {
+                    this.loadProgress = data;
+                }
+            } catch (error) {
+                console.error(`获取加载进度失败: ${error.message}`);
             }
         },
         
@@ -229,19 +264,37 @@ createApp({
                     },
                     body: JSON.stringify({
                         total_count: this.totalSelectedQuestions,
-                        type_ratios: filteredCounts // 这里使用type_ratios参数名保持兼容
+                        type_ratios: filteredCounts, // 这里使用type_ratios参数名保持兼容
+                        lean: this.leanMode,
+                        format: this.wireFormat
                     })
                 });
                 
                 const data = await response.json();
                 if (data.success) {
                     this.totalQuestions = data.questions_count;
-                    this.localQuestions = data.questions; // 保存题目数据到本地
+                    if (data.lean) {
+                        // 先用答题卡骨架占位，题目内容按窗口加载
+                        const sheet = data.sheet;
+                        this.localQuestions = sheet.ids.map((id, i) => ({
+                            id: id,
+                            type: sheet.types[sheet.type_codes[i]],
+                            loaded: false
+                        }));
+                    } else {
+                        this.localQuestions = this.decodeQuestions(data); // 保存题目数据到本地
+                    }
                     this.localAnswers = {}; // 初始化本地答案存储
                     this.localViewedAnswers = {}; // 初始化本地已查看答案状态
-                    this.step = 'answer';
+                    this.pendingWindows = {};
+                    clearTimeout(this.answerTimer);
+                    this.answerBatch = {};
+                    this.answerVersion = 0;
+                    this.paperId = data.paper_id;
+                    this.answerFlush = null;
                     this.currentIndex = 0;
-                    this.loadCurrentQuestion();
+                    await this.loadCurrentQuestion();
+                    this.step = 'answer';
                     this.showNotification('题目抽取成功', 'success');
                 } else {
                     this.error = data.message;
@@ -251,11 +304,85 @@ createApp({
             }
         },
         
-        loadCurrentQuestion() {
-            /* 从本地加载当前题目 */
+        decodeQuestions(data) {
+            /* 将服务器返回的题目列表还原为题目对象数组（见wire_format.py中的格式说明） */
+            if (data.format !== 'columnar') {
+                return data.questions;
+            }
+            const payload = data.questions;
+            const strings = payload.strings;
+            const records = Array.from({ length: payload.count }, () => ({}));
+            payload.columns.forEach(column => {
+                const values = column.values;
+                for (let i = 0; i < values.length; i++) {
+                    let value = values[i];
+                    if (value === null) continue;
+                    if (column.kind === 'table') {
+                        value = strings[value];
+                    } else if (column.kind === 'table_list') {
+                        value = value.map(code => strings[code]);
+                    }
+                    records[i][column.name] = value;
+                }
+            });
+            return records;
+        },
+        
+        async ensureQuestions(index) {
+            /* 确保index所在窗口的题目已加载（精简模式），同一窗口只请求一次 */
+            if (index < 0 || index >= this.localQuestions.length) return;
+            const question = this.localQuestions[index];
+            if (question.loaded !== false) return;
+            
+            const start = Math.floor(index / this.questionWindow) * this.questionWindow;
+            if (!this.pendingWindows[start]) {
+                this.pendingWindows[start] = (async () => {
+                    try {
+                        const response = await fetch(`/api/questions?start=${start}&count=${this.questionWindow}&format=${this.wireFormat}`);
+                        const data = await response.json();
+                        if (!data.success) {
+                            throw new Error(data.message);
+                        }
+                        this.decodeQuestions(data).forEach((body, offset) => {
+                            const i = start + offset;
+                            this.localQuestions[i] = body;
+                            if (data.viewed[offset]) {
+                                this.localViewedAnswers[i] = true;
+                            }
+                            if (data.user_answers[offset].length > 0 && !this.localAnswers[i]) {
+                                this.localAnswers[i] = data.user_answers[offset];
+                            }
+                        });
+                    } finally {
+                        delete this.pendingWindows[start];
+                    }
+                })();
+            }
+            await this.pendingWindows[start];
+        },
+        
+        prefetchAhead() {
+            /* 预取当前题目之后的窗口，翻页时无需等待 */
+            const ahead = this.currentIndex + Math.floor(this.questionWindow / 2);
+            if (ahead < this.localQuestions.length) {
+                this.ensureQuestions(ahead).catch(error => {
+                    console.error(`预取题目失败: ${error.message}`);
+                });
+            }
+        },
+        
+        async loadCurrentQuestion() {
+            /* 从本地加载当前题目，精简模式下按需加载所在窗口并预取后续题目 */
             this.error = '';
+            if (this.leanMode) {
+                this.flushAnswers(); // 切换题目时立即提交未保存的答案
+            }
             try {
                 if (this.currentIndex >= 0 && this.currentIndex < this.localQuestions.length) {
+                    const index = this.currentIndex;
+                    await this.ensureQuestions(index);
+                    if (index !== this.currentIndex) return; // 加载期间已切换到其他题目
+                    this.prefetchAhead();
                     this.currentQuestion = this.localQuestions[this.currentIndex];
                     this.userAnswer = this.localAnswers[this.currentIndex] || [];
                     this.isAnswerViewed = this.localViewedAnswers[this.currentIndex] || false;
@@ -271,7 +398,7 @@ createApp({
                     
                     // 如果已经查看过答案，获取正确答案
                     if (this.isAnswerViewed) {
-                        this.correctAnswer = this.currentQuestion.correct_answer;
+                        this.correctAnswer = this.currentQuestion.correct_answer || [];
                     } else {
                         // 否则清空正确答案
                         this.correctAnswer = [];
@@ -289,35 +416,45 @@ createApp({
             }
         },
         
-        async fetchCorrectAnswer() {
-            /* 获取正确答案 */
+        async fetchCorrectAnswer(index) {
+            /* 获取第index题的正确答案和解析，返回服务器数据，失败时返回null；不修改界面状态 */
             try {
-                const response = await fetch(`/api/questions/${this.currentIndex}/view_answer`, {
+                const response = await fetch(`/api/questions/${index}/view_answer`, {
                     method: 'POST'
                 });
                 
                 const data = await response.json();
                 if (data.success) {
-                    this.correctAnswer = data.correct_answer;
-                    // 只更新答案解析，不刷新整个题目
-                    this.currentQuestion.analysis = data.analysis;
+                    return data;
                 }
+                console.error(`获取正确答案失败: ${data.message}`);
             } catch (error) {
                 console.error(`获取正确答案失败: ${error.message}`);
             }
+            return null;
         },
         
-
-        
-        viewAnswer() {
-            /* 在本地查看答案 */
+        async viewAnswer() {
+            /* 查看答案：题目数据中已有答案时直接显示，精简模式下向服务器获取 */
             this.error = '';
             try {
-                if (this.currentIndex >= 0 && this.currentIndex < this.localQuestions.length) {
+                // 请求前记下题号和题目，等待期间切换了题目时答案仍写回这道题，不会显示到其他题目上
+                const index = this.currentIndex;
+                const question = this.currentQuestion;
+                if (index >= 0 && index < this.localQuestions.length) {
                     this.isAnswerViewed = true;
-                    this.localViewedAnswers[this.currentIndex] = true; // 更新本地已查看答案状态
-                    this.correctAnswer = this.currentQuestion.correct_answer; // 从本地题目中获取正确答案
-                    this.showNotification('答案已显示', 'info');
+                    this.localViewedAnswers[index] = true; // 更新本地已查看答案状态
+                    if (!question.correct_answer) {
+                        const data = await this.fetchCorrectAnswer(index);
+                        if (data) {
+                            question.correct_answer = data.correct_answer;
+                            question.analysis = data.analysis; // 只更新答案解析，不刷新整个题目
+                        }
+                    }
+                    if (this.currentIndex === index) {
+                        this.correctAnswer = question.correct_answer || []; // 从本地题目中获取正确答案
+                        this.showNotification('答案已显示', 'info');
+                    }
                 } else {
                     this.error = '题目索引无效';
                 }
@@ -353,9 +490,30 @@ createApp({
             );
         },
         
-        _submitExam() {
-            /* 在本地计算考试结果 */
+        async _submitExam() {
+            /* 计算考试结果：精简模式下由服务器判分，否则在本地计算 */
             this.error = '';
+            if (this.leanMode) {
+                try {
+                    // 等待所有答案都已提交到服务器
+                    await this.flushAnswers();
+                    if (Object.keys(this.answerBatch).length > 0) {
+                        this.error = '部分答案未能保存到服务器，请检查网络后重新提交';
+                        return;
+                    }
+                    const response = await fetch('/api/submit', { method: 'POST' });
+                    const data = await response.json();
+                    if (data.success) {
+                        this.result = data;
+                        this.step = 'result';
+                    } else {
+                        this.error = data.message;
+                    }
+                } catch (error) {
+                    this.error = `提交失败: ${error.message}`;
+                }
+                return;
+            }
             try {
                 const total_questions = this.localQuestions.length;
                 let correct_count = 0;
@@ -537,14 +695,63 @@ createApp({
         },
         
         _saveCurrentAnswer() {
-            /* 自动保存当前答案到本地 */
+            /* 自动保存当前答案到本地，精简模式下同时提交到服务器用于判分 */
             try {
                 this.localAnswers[this.currentIndex] = [...this.userAnswer];
+                if (this.leanMode) {
+                    // 连续作答时合并为一次批量保存
+                    this.answerBatch[this.currentIndex] = [...this.userAnswer];
+                    clearTimeout(this.answerTimer);
+                    this.answerTimer = setTimeout(() => this.flushAnswers(), this.answerSaveDelay);
+                }
             } catch (error) {
                 console.error(`自动保存答案失败: ${error.message}`);
             }
         },
         
+        async flushAnswers() {
+            /* 将尚未提交的答案批量保存到服务器，同一时间只有一个批量请求，保证按版本号顺序到达 */
+            clearTimeout(this.answerTimer);
+            while (this.answerFlush) {
+                await this.answerFlush;
+            }
+            const batch = this.answerBatch;
+            if (Object.keys(batch).length === 0) return;
+            this.answerBatch = {};
+            this.answerVersion++;
+            const paperId = this.paperId;
+            let flush = null;
+            flush = (async () => {
+                try {
+                    const response = await fetch('/api/answers', {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json'
+                        },
+                        body: JSON.stringify({ answers: batch, version: this.answerVersion, paper_id: paperId })
+                    });
+                    const data = await response.json();
+                    if (!data.success) {
+                        throw new Error(data.message);
+                    }
+                } catch (error) {
+                    console.error(`提交答案失败: ${error.message}`);
+                    // 保存失败的答案放回待提交列表（期间又修改过的以新答案为准），下次一并提交；
+                    // 期间已经抽取了新试卷时，这些答案属于上一份试卷，直接丢弃
+                    if (paperId === this.paperId) {
+                        this.answerBatch = { ...batch, ...this.answerBatch };
+                    }
+                } finally {
+                    // 抽取新试卷时已重置answerFlush，上一份试卷迟到的请求不能清除新试卷正在进行的保存
+                    if (this.answerFlush === flush) {
+                        this.answerFlush = null;
+                    }
+                }
+            })();
+            this.answerFlush = flush;
+            await flush;
+        },
+        
         autoSaveAnswer() {
             /* 处理填空题/简答题的自动保存 */
             if (!this.studyMode) {
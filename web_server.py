@@ -1,55 +1,277 @@
 import os
+import gzip
 import json
-import random
+import time
+import queue
+import atexit
+import hashlib
 import logging
+import logging.handlers
 import datetime
-from flask import Flask, request, jsonify, send_from_directory
+import threading
+from flask import Flask, Response, request, jsonify, send_from_directory, g
 from flask_cors import CORS
 
-# 配置日志系统
-log_dir = 'logs'
+from question_bank import (
+    EMPTY_SNAPSHOT, MultiBankView, build_search_index_in_background, question_fingerprint,
+    sample_indices_by_type, snapshot_of
+)
+from grading import grade_session
+from weighted_sampling import HISTORY_FILE, WEIGHT_MODES, QuestionHistory, WeightedSamplerCache
+from search_index import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SearchResult
+from session_store import SESSION_COOKIE, SESSION_HEADER, SessionStore
+from bank_cache import DEFAULT_MAX_BYTES, BankCache
+from wire_format import WIRE_FORMATS, encode_questions
+from wrong_book_catalog import WrongBookCatalog
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from static_assets import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, ENTRY_PAGE, StaticAssets, accepts_gzip
+
+# 配置日志系统（日志目录可通过环境变量LOG_DIR指定）
+log_dir = os.environ.get('LOG_DIR', 'logs')
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
 
-log_filename = os.path.join(log_dir, f'web_server_{datetime.datetime.now().strftime("%Y%m%d")}.log')
+log_filename = os.path.join(log_dir, 'web_server.log')
+access_log_filename = os.path.join(log_dir, 'access.log')
+
+# 日志轮转方式：默认按大小轮转（LOG_MAX_MB，默认20MB），设置LOG_ROTATE_WHEN（如midnight、H）后按时间轮转；
+# LOG_BACKUP_COUNT为保留的历史日志文件数
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_MB', '20')) * 1024 * 1024
+LOG_ROTATE_WHEN = os.environ.get('LOG_ROTATE_WHEN')
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', '10'))
+
+
+def rotating_file_handler(file_path):
+    if LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(
+            file_path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    return logging.handlers.RotatingFileHandler(
+        file_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+
+
+def start_log_listener(*handlers):
+    """日志先放入队列，由后台线程写入文件和控制台，请求线程不会因写日志而阻塞"""
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))  # 时间和级别由写入文件的处理器统一添加
+    return queue_handler
+
 
 # 设置日志格式
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler(log_filename, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+log_formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+log_handlers = [rotating_file_handler(log_filename), logging.StreamHandler()]
+for handler in log_handlers:
+    handler.setFormatter(log_formatter)
+logging.basicConfig(level=logging.INFO, handlers=[start_log_listener(*log_handlers)])
 
 logger = logging.getLogger(__name__)
 
+# 访问日志：每个请求一行JSON（路由、状态码、响应字节数、耗时和会话标识），单独写入access.log
+access_logger = logging.getLogger('access')
+access_logger.propagate = False
+access_logger.setLevel(logging.INFO)
+access_logger.addHandler(start_log_listener(rotating_file_handler(access_log_filename)))
+
 # 获取当前脚本所在目录的绝对路径
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
-app = Flask(__name__, static_folder='web', static_url_path='')
-CORS(app, resources={r"/*": {"origins": "*"}})  # 允许所有跨域请求
+STATIC_DIR = os.path.join(BASE_DIR, 'web')
+
+# 静态资源由static_assets统一发布（预压缩、内容哈希地址），不使用Flask自带的静态路由
+app = Flask(__name__, static_folder=None)
+CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=[SESSION_HEADER])  # 允许所有跨域请求
+
+
+# 运行指标，通过GET /metrics按Prometheus文本格式输出；环境变量METRICS_ENABLED=0时关闭（不采集也不提供该接口）
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+metrics = MetricsRegistry()
+request_counter = metrics.counter('tg_http_requests_total', '按路由、方法和状态码统计的请求数',
+                                  ('route', 'method', 'status'))
+request_duration = metrics.histogram('tg_http_request_duration_seconds', '按路由统计的请求耗时（秒）',
+                                     ('route', 'method'))
+wrong_book_write_duration = metrics.histogram('tg_wrong_book_write_seconds', '保存错题本（含更新目录索引）的耗时（秒）')
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+def session_label():
+    """访问日志中的会话标识：令牌的哈希前缀，不在日志中记录令牌本身"""
+    session = getattr(g, 'exam_session', None)
+    token = session.token if session is not None else \
+        request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    if not token:
+        return None
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()[:12]
+
+
+# 最先注册，最后执行：记录的字节数为压缩后的实际响应大小
+@app.after_request
+def log_access(response):
+    start = getattr(g, 'request_start', None)
+    duration = time.perf_counter() - start if start is not None else None
+    if METRICS_ENABLED and duration is not None:
+        # 未匹配任何路由的请求合并为一个标签值，避免按路径产生大量时间序列
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        request_counter.inc((route, request.method, str(response.status_code)))
+        request_duration.observe(duration, (route, request.method))
+    access_logger.info(json.dumps({
+        'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+        'method': request.method,
+        'route': request.url_rule.rule if request.url_rule is not None else request.path,
+        'status': response.status_code,
+        'bytes': response.content_length,
+        'duration_ms': round(duration * 1000, 3) if duration is not None else None,
+        'session': session_label()
+    }, ensure_ascii=False))
+    return response
+
+# 每隔多少秒最多检查一次web目录中的文件是否变化（环境变量STATIC_CHECK_SECONDS，设为0时启动后不再检查）
+STATIC_CHECK_SECONDS = float(os.environ.get('STATIC_CHECK_SECONDS', '2'))
+static_assets = StaticAssets(STATIC_DIR, STATIC_CHECK_SECONDS or None)
+
+
+def asset_response(path):
+    """返回静态资源：按Accept-Encoding返回预先压缩的内容，带哈希的地址永久缓存，其余地址每次确认"""
+    asset, immutable = static_assets.lookup(path)
+    if asset is None:
+        return None
+    body, encoding = asset.select(request.headers.get('Accept-Encoding'))
+    response = Response(body, mimetype=asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    response.set_etag(asset.etag(encoding))
+    return response.make_conditional(request)
 
 # 确保静态资源能够被正确访问
 @app.route('/<path:path>')
 def serve_static(path):
-    return send_from_directory(app.static_folder, path)
-
-# 全局变量管理题库和用户会话
-question_manager = {
-    'questions': [],
-    'selected_questions': [],
-    'user_answers': {},
-    'viewed_answers': {}
+    response = asset_response(path)
+    if response is None:
+        return send_from_directory(STATIC_DIR, path)
+    return response
+
+# 每名考生的答题会话（试卷、作答和已查看答案），按Cookie或请求头中的令牌区分
+session_store = SessionStore()
+
+
+def current_session(create=False):
+    """获取当前请求对应的答题会话，create为True时在没有会话时创建新会话"""
+    session = getattr(g, 'exam_session', None)
+    if session is not None:
+        return session
+    token = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    session = session_store.get(token)
+    if session is None and create:
+        session = session_store.create()
+        g.new_session_token = session.token
+    g.exam_session = session
+    return session
+
+
+@app.after_request
+def attach_session_token(response):
+    """通过Cookie把令牌交给客户端，新建会话时同时放在响应头中
+    
+    服务器端的闲置过期时间在每次访问时顺延，因此每次访问会话时都重新设置Cookie，
+    让Cookie的有效期与服务器端一致，持续答题超过闲置时间也不会丢失会话。
+    """
+    session = getattr(g, 'exam_session', None)
+    if session is not None:
+        response.set_cookie(SESSION_COOKIE, session.token, max_age=session_store.idle_ttl,
+                            httponly=True, samesite='Lax')
+    token = getattr(g, 'new_session_token', None)
+    if token:
+        response.headers[SESSION_HEADER] = token
+    return response
+
+
+# JSON响应超过该大小（字节）时按Accept-Encoding进行gzip压缩，压缩级别兼顾速度和压缩率
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_LEVEL = 6
+
+
+@app.after_request
+def compress_json_response(response):
+    """压缩较大的JSON响应；GET接口按响应内容生成ETag，内容未变化时返回304
+    
+    列表、统计、加载进度等只读接口会被前端反复轮询，内容不变时只需返回304而无需传输响应体。
+    """
+    if response.mimetype != 'application/json' or response.direct_passthrough or \
+            'Content-Encoding' in response.headers:
+        return response
+    body = response.get_data()
+    use_gzip = len(body) >= COMPRESS_MIN_BYTES and accepts_gzip(request.headers.get('Accept-Encoding'))
+    if use_gzip:
+        response.vary.add('Accept-Encoding')
+    
+    if request.method == 'GET' and response.status_code == 200:
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        response.set_etag(f'{digest}-gzip' if use_gzip else digest)
+        response.headers['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+    
+    if use_gzip:
+        response.set_data(gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def no_session_response():
+    return jsonify({'success': False, 'message': '没有进行中的答题，请先抽取题目'}), 404
+
+# 题库加载进度，加载大题库时供前端轮询显示部分统计
+load_progress = {
+    'file_path': None,
+    'loading': False,
+    'loaded': 0,
+    'stats': {}
 }
 
+# 最近加载过的题库的内存缓存预算（MB），可通过环境变量BANK_CACHE_MB调整，设为0时不缓存
+BANK_CACHE_MAX_BYTES = int(os.environ.get('BANK_CACHE_MB', DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024
+
 class SafeQuestionManager:
     """安全的题库管理类，防止跨目录访问和代码注入"""
     
     def __init__(self):
-        self.questions = []
-        self.current_file = None
+        # 当前题库的只读快照；重新加载时整体替换为新快照，请求只需在开始时取得一次引用
+        self.snapshot = EMPTY_SNAPSHOT
+        # 串行化题库加载，避免两个加载请求交错发布快照
+        self.load_lock = threading.Lock()
+        # 最近加载过的题库，在多个题库之间切换时无需重新解析
+        self.bank_cache = BankCache(BANK_CACHE_MAX_BYTES)
+        # 做题记录，用于加权抽题；所有答题会话共用同一份记录，不按用户区分
+        self.history = QuestionHistory(os.path.join(BASE_DIR, HISTORY_FILE))
+        # 加权抽题时复用的权重树状数组，做题记录变化时只更新变化的题目
+        self.weighted_samplers = WeightedSamplerCache()
+        # 加载题库后是否在后台构建全文搜索索引（为False时在首次搜索时构建）
+        self.background_search_index = True
+    
+    @property
+    def questions(self):
+        return self.snapshot.questions
+    
+    @property
+    def type_index(self):
+        return self.snapshot.type_index
+    
+    @property
+    def question_stats(self):
+        return self.snapshot.stats
+    
+    @property
+    def current_file(self):
+        return self.snapshot.path
     
     def get_available_files(self):
         """获取BASE_DIR下所有可用的JSON题库文件"""
@@ -63,8 +285,8 @@ class SafeQuestionManager:
             print(f"获取可用文件失败: {e}")
             return []
     
-    def load_questions(self, file_path):
-        """安全加载题库文件，仅允许访问BASE_DIR下的JSON文件"""
+    def _safe_path(self, file_path):
+        """校验题库文件路径，仅允许访问BASE_DIR下的JSON文件"""
         # 确保文件路径在BASE_DIR内
         safe_path = os.path.abspath(os.path.join(BASE_DIR, file_path))
         if not safe_path.startswith(BASE_DIR):
@@ -73,47 +295,94 @@ class SafeQuestionManager:
         # 确保只加载JSON文件
         if not safe_path.endswith('.json'):
             raise ValueError("仅允许加载JSON格式的题库文件")
+        return safe_path
+    
+    def load_questions(self, file_path, on_progress=None):
+        """安全加载题库文件，仅允许访问BASE_DIR下的JSON文件"""
+        safe_path = self._safe_path(file_path)
         
         try:
-            with open(safe_path, 'r', encoding='utf-8') as f:
-                self.questions = json.load(f)
-            
-            # 自动识别选择题类型：根据正确答案数量将"选择题"转换为"单选题"或"多选题"
-            for question in self.questions:
-                if question.get('type') == '选择题':
-                    correct_answers = question.get('correct_answer', [])
-                    # 过滤掉空答案
-                    correct_answers = [ans for ans in correct_answers if ans.strip()]
-                    
-                    if len(correct_answers) > 1:
-                        question['type'] = '多选题'
-                    else:
-                        question['type'] = '单选题'
-            
-            self.current_file = safe_path
+            with self.load_lock:
+                # 优先使用内存中的题库缓存，其次是旁路缓存，源文件变化后两者都会失效
+                bank = self.bank_cache.load(safe_path, on_progress=on_progress)
+                self._publish(bank, safe_path)
+            return True
+        except json.JSONDecodeError:
+            raise ValueError("无效的JSON文件格式")
+        except PermissionError:
+            raise ValueError("没有权限访问该文件")
+        except Exception as e:
+            print(f"加载题库失败: {e}")
+            return False
+    
+    def load_question_files(self, file_paths):
+        """同时加载多个题库文件作为一个虚拟题库，各文件分段保存，不拼接题目列表
+        
+        再次加载相同的文件组合时，只重新加载自上次加载以来有变化的文件。
+        """
+        safe_paths = [self._safe_path(file_path) for file_path in file_paths]
+        
+        try:
+            with self.load_lock:
+                current = self.snapshot.questions
+                if isinstance(current, MultiBankView) and current.paths == safe_paths:
+                    view = current.refreshed(loader=self.bank_cache.load)
+                else:
+                    view = MultiBankView([self.bank_cache.load(path) for path in safe_paths])
+                self._publish(view, safe_paths)
+            return True
+        except json.JSONDecodeError:
+            raise ValueError("无效的JSON文件格式")
+        except PermissionError:
+            raise ValueError("没有权限访问该文件")
+        except Exception as e:
+            print(f"加载题库失败: {e}")
+            return False
+    
+    def reload_question_file(self, file_path):
+        """重新加载虚拟题库中的某个文件，只重建该文件对应的分段
+        
+        当前为单个题库时只能重新加载该题库本身；file_path不是当前题库的文件时抛出ValueError，不会替换已加载的题库。
+        """
+        safe_path = self._safe_path(file_path)
+        if not isinstance(self.snapshot.questions, MultiBankView):
+            if safe_path != self.snapshot.path:
+                raise ValueError("只能重新加载当前已加载的题库文件")
+            return self.load_questions(file_path)
+        try:
+            with self.load_lock:
+                current = self.snapshot
+                view = current.questions.with_segment_reloaded(safe_path, loader=self.bank_cache.load)
+                if view is None:
+                    raise ValueError("只能重新加载当前已加载的题库文件")
+                self._publish(view, current.path)
             return True
         except json.JSONDecodeError:
             raise ValueError("无效的JSON文件格式")
         except PermissionError:
             raise ValueError("没有权限访问该文件")
+        except ValueError:
+            raise
         except Exception as e:
             print(f"加载题库失败: {e}")
             return False
     
-    def get_stats(self):
+    def _publish(self, bank, path):
+        """为新加载的题库（单个题库或虚拟题库）生成完整的快照后再一次性替换
+        
+        全文搜索索引不在加载时构建，以免阻塞加载请求和load_lock；在后台线程或首次搜索时构建。
+        """
+        self.snapshot = snapshot_of(bank, path)
+        if self.background_search_index:
+            build_search_index_in_background(bank)
+    
+    def get_stats(self, snapshot=None):
         """获取题库统计信息"""
-        stats = {}
-        for question in self.questions:
-            q_type = question['type']
-            if q_type in stats:
-                stats[q_type] += 1
-            else:
-                stats[q_type] = 1
-        return stats
+        return (snapshot or self.snapshot).stats
     
-    def get_total_questions(self):
+    def get_total_questions(self, snapshot=None):
         """获取题库总题数"""
-        return len(self.questions)
+        return len((snapshot or self.snapshot).questions)
     
     def extract_questions(self, total_count, type_ratios):
         """根据比例配置抽取题目"""
@@ -142,50 +411,97 @@ class SafeQuestionManager:
         
         return self._extract_by_counts(question_counts)
     
-    def _extract_by_counts(self, type_counts):
-        """根据各题型数量抽取题目"""
-        selected_questions = []
-        stats = self.get_stats()
+    def extract_indices_by_count(self, type_counts, weight_mode=None, tag_weights=None, snapshot=None):
+        """根据各题型数量抽取题目，返回抽中题目在快照题库（默认为当前题库）中的下标
+        
+        加权抽题使用的做题记录由所有答题会话共用：任何用户抽到或答错的题都会影响其他用户的抽题权重。
+        """
+        snapshot = snapshot or self.snapshot
+        weighted = None
+        if weight_mode:
+            weighted = self.weighted_samplers.sampler(weight_mode, self.history, tag_weights, question_fingerprint)
+        
+        # 按题型索引抽取，无需每次扫描整个题库
+        questions = snapshot.questions
+        selected_indices = sample_indices_by_type(questions, snapshot.type_index, type_counts, weighted=weighted)
         
-        # 定义优先题型顺序
-        type_order = ['单选题', '多选题', '判断题', '填空题', '简答题', '释义题']
-        
-        # 处理优先顺序中的题型
-        processed_types = set()
-        for q_type in type_order:
-            if q_type in type_counts and type_counts[q_type] > 0:
-                # 筛选出该题型的所有题目
-                type_questions = [q for q in self.questions if q['type'] == q_type]
-                
-                # 随机抽取指定数量的题目
-                selected = random.sample(type_questions, min(type_counts[q_type], len(type_questions)))
-                selected_questions.extend(selected)
-                processed_types.add(q_type)
-        
-        # 处理剩余的其他题型（不在优先顺序列表中但用户选择了的题型）
-        for q_type in type_counts:
-            if q_type not in processed_types and type_counts[q_type] > 0:
-                # 筛选出该题型的所有题目
-                type_questions = [q for q in self.questions if q['type'] == q_type]
-                if type_questions:
-                    # 随机抽取指定数量的题目
-                    selected = random.sample(type_questions, min(type_counts[q_type], len(type_questions)))
-                    selected_questions.extend(selected)
-        
-        return selected_questions
-    
-    def extract_questions_by_count(self, type_counts):
-        """根据各题型数量抽取题目（公开方法）"""
-        return self._extract_by_counts(type_counts)
+        # 记录本次抽到的题目，用于按未练习时长加权
+        self.history.record_seen(question_fingerprint(questions[i]) for i in selected_indices)
+        return selected_indices
+    
+    def _extract_by_counts(self, type_counts, weight_mode=None, tag_weights=None):
+        """根据各题型数量抽取题目"""
+        snapshot = self.snapshot
+        indices = self.extract_indices_by_count(type_counts, weight_mode, tag_weights, snapshot)
+        return [snapshot.questions[i] for i in indices]
+    
+    def extract_questions_by_count(self, type_counts, weight_mode=None, tag_weights=None):
+        """根据各题型数量抽取题目（公开方法），可按答错次数、未练习时长或标签权重加权抽取"""
+        return self._extract_by_counts(type_counts, weight_mode, tag_weights)
+    
+    def search_questions(self, query, page=1, page_size=DEFAULT_PAGE_SIZE, snapshot=None):
+        """全文搜索题干、选项和解析，返回按相关度排序的分页结果"""
+        snapshot = snapshot or self.snapshot
+        if snapshot.search_index is None:
+            return SearchResult(0, [])
+        return snapshot.search_index.search(query, page, page_size)
+    
+    def record_wrong_answers(self, wrong_questions):
+        """记录答错的题目，用于按答错次数加权抽题"""
+        self.history.record_wrong(question_fingerprint(q) for q in wrong_questions)
 
 # 初始化安全的题库管理器
 safe_manager = SafeQuestionManager()
 
-# 错题本保存目录
-WRONG_QUESTIONS_DIR = os.path.join(BASE_DIR, 'wrong_questions')
+# 错题本保存目录（可通过环境变量WRONG_QUESTIONS_DIR指定）
+WRONG_QUESTIONS_DIR = os.environ.get('WRONG_QUESTIONS_DIR') or os.path.join(BASE_DIR, 'wrong_questions')
 # 确保错题本目录存在
 if not os.path.exists(WRONG_QUESTIONS_DIR):
     os.makedirs(WRONG_QUESTIONS_DIR)
+# 错题本目录索引，列出错题本时无需逐个解析文件
+wrong_book_catalog = WrongBookCatalog(WRONG_QUESTIONS_DIR)
+
+
+def write_wrong_book(file_name, wrong_book):
+    """保存错题本并记录耗时，返回文件路径"""
+    start = time.perf_counter()
+    file_path = wrong_book_catalog.write(file_name, wrong_book)
+    if METRICS_ENABLED:
+        wrong_book_write_duration.observe(time.perf_counter() - start)
+    return file_path
+
+
+def bank_metrics():
+    snapshot = safe_manager.snapshot
+    return [((), len(snapshot.questions))]
+
+
+def bank_cache_metrics(field):
+    return lambda: [((), safe_manager.bank_cache.stats()[field])]
+
+
+def bank_cache_hit_ratio():
+    stats = safe_manager.bank_cache.stats()
+    lookups = stats['hits'] + stats['misses']
+    return [((), stats['hits'] / lookups if lookups else 0.0)]
+
+
+def session_metrics(field):
+    return lambda: [((), session_store.stats()[field])]
+
+
+metrics.callback('tg_active_sessions', '当前保留的答题会话数', 'gauge', session_metrics('active'))
+metrics.callback('tg_sessions_created_total', '累计创建的答题会话数', 'counter', session_metrics('created'))
+metrics.callback('tg_sessions_evicted_total', '因数量上限淘汰的答题会话数', 'counter', session_metrics('evicted'))
+metrics.callback('tg_sessions_expired_total', '闲置过期的答题会话数', 'counter', session_metrics('expired'))
+metrics.callback('tg_loaded_questions', '当前加载的题库（含多个题库合并）的题目数', 'gauge', bank_metrics)
+metrics.callback('tg_bank_cache_entries', '内存中缓存的题库数', 'gauge', bank_cache_metrics('entries'))
+metrics.callback('tg_bank_cache_bytes', '缓存题库估算占用的内存（字节）', 'gauge', bank_cache_metrics('bytes'))
+metrics.callback('tg_bank_cache_max_bytes', '题库缓存的内存预算（字节）', 'gauge', bank_cache_metrics('max_bytes'))
+metrics.callback('tg_bank_cache_hits_total', '题库缓存命中次数', 'counter', bank_cache_metrics('hits'))
+metrics.callback('tg_bank_cache_misses_total', '题库缓存未命中次数', 'counter', bank_cache_metrics('misses'))
+metrics.callback('tg_bank_cache_evictions_total', '题库缓存淘汰次数', 'counter', bank_cache_metrics('evictions'))
+metrics.callback('tg_bank_cache_hit_ratio', '题库缓存命中率', 'gauge', bank_cache_hit_ratio)
 
 @app.route('/api/available_files', methods=['GET'])
 def get_available_files():
@@ -205,16 +521,37 @@ def load_questions():
     """加载题库文件"""
     data = request.get_json()
     file_path = data.get('file_path', 'questions.json')
+    # 传入file_paths时将多个题库文件作为一个虚拟题库加载
+    file_paths = data.get('file_paths')
+    if file_paths is not None and (not isinstance(file_paths, list) or not file_paths
+                                   or not all(isinstance(path, str) for path in file_paths)):
+        return jsonify({'success': False, 'message': 'file_paths必须是非空的文件名列表'}), 400
+    # 传入reload_file时只重新加载当前虚拟题库中的这个成员文件，其余文件直接复用
+    reload_file = data.get('reload_file')
+    if reload_file is not None and (not isinstance(reload_file, str) or not reload_file):
+        return jsonify({'success': False, 'message': 'reload_file必须是文件名'}), 400
+    
+    def update_progress(loaded, stats):
+        load_progress['loaded'] = loaded
+        load_progress['stats'] = dict(stats)
     
+    load_progress.update({'file_path': reload_file or file_paths or file_path,
+                          'loading': True, 'loaded': 0, 'stats': {}})
     try:
-        success = safe_manager.load_questions(file_path)
+        if reload_file:
+            success = safe_manager.reload_question_file(reload_file)
+        elif file_paths:
+            success = safe_manager.load_question_files(file_paths)
+        else:
+            success = safe_manager.load_questions(file_path, on_progress=update_progress)
         if success:
-            stats = safe_manager.get_stats()
+            snapshot = safe_manager.snapshot
+            stats = safe_manager.get_stats(snapshot)
             return jsonify({
                 'success': True,
                 'message': '题库加载成功',
                 'stats': stats,
-                'total_questions': safe_manager.get_total_questions()
+                'total_questions': safe_manager.get_total_questions(snapshot)
             })
         else:
             return jsonify({'success': False, 'message': '题库加载失败'})
@@ -224,10 +561,31 @@ def load_questions():
     except Exception as e:
         logger.error(f'加载题库失败: {str(e)}')
         return jsonify({'success': False, 'message': f'加载失败: {str(e)}'}), 500
+    finally:
+        load_progress['loading'] = False
+
+@app.route('/api/load_progress', methods=['GET'])
+def get_load_progress():
+    """获取题库加载进度及已读取部分的题型统计"""
+    return jsonify({
+        'success': True,
+        'file_path': load_progress['file_path'],
+        'loading': load_progress['loading'],
+        'loaded': load_progress['loaded'],
+        'stats': load_progress['stats']
+    })
+
+@app.route('/api/bank_cache', methods=['GET'])
+def get_bank_cache_stats():
+    """获取题库内存缓存的命中/未命中次数、淘汰次数和内存占用"""
+    return jsonify({'success': True, 'cache': safe_manager.bank_cache.stats()})
 
 @app.route('/api/extract_questions', methods=['POST'])
 def extract_questions():
-    """抽取题目"""
+    """抽取题目
+    
+    weight_mode加权抽题依据的做题记录是全服务器共用的，不区分会话或用户。
+    """
     data = request.get_json()
     
     try:
@@ -242,17 +600,50 @@ def extract_questions():
                 logger.error('题型数量必须是非负整数')
                 return jsonify({'success': False, 'message': '题型数量必须是非负整数'}), 400
         
-        # 重置用户会话
-        # 直接传递type_counts作为各题型的数量
-        question_manager['selected_questions'] = safe_manager.extract_questions_by_count(type_counts)
-        question_manager['user_answers'] = {}
-        question_manager['viewed_answers'] = {}
+        # 加权抽题方式（可选）：wrong-优先答错过的题，stale-优先久未练习的题，tags-按标签权重
+        weight_mode = data.get('weight_mode') or None
+        if weight_mode is not None and weight_mode not in WEIGHT_MODES:
+            logger.error(f'不支持的抽题方式: {weight_mode}')
+            return jsonify({'success': False, 'message': f'不支持的抽题方式: {weight_mode}'}), 400
+        
+        tag_weights = data.get('tag_weights') or {}
+        if not isinstance(tag_weights, dict) or not all(
+                isinstance(w, (int, float)) and w >= 0 for w in tag_weights.values()):
+            logger.error('标签权重必须是非负数')
+            return jsonify({'success': False, 'message': '标签权重必须是非负数'}), 400
+        
+        # 题目列表的传输格式（可选）：json-普通JSON（默认），columnar-共享字符串表加按列存储的紧凑格式
+        wire_format = data.get('format') or 'json'
+        if wire_format not in WIRE_FORMATS:
+            return jsonify({'success': False, 'message': f'不支持的传输格式: {wire_format}'}), 400
+        
+        # 直接传递type_counts作为各题型的数量，试卷只保存题目下标
+        # 整个请求使用同一份题库快照，抽题期间重新加载题库不会影响本次抽题
+        snapshot = safe_manager.snapshot
+        selected_indices = safe_manager.extract_indices_by_count(type_counts, weight_mode, tag_weights, snapshot)
+        
+        # 重置当前考生的答题会话，不影响其他考生
+        session = current_session(create=True)
+        session.start(snapshot.questions, selected_indices)
+        
+        # 精简模式只返回题号、题型和答题卡骨架，题目内容通过/api/questions按窗口获取，答案不会提前下发
+        if data.get('lean'):
+            return jsonify({
+                'success': True,
+                'message': '题目抽取成功',
+                'questions_count': len(session),
+                'paper_id': session.paper_id,
+                'lean': True,
+                'sheet': answer_sheet_skeleton(session)
+            })
         
         return jsonify({
             'success': True,
             'message': '题目抽取成功',
-            'questions_count': len(question_manager['selected_questions']),
-            'questions': question_manager['selected_questions']  # 返回完整题目数据
+            'questions_count': len(session),
+            'paper_id': session.paper_id,
+            'format': wire_format,
+            'questions': encode_questions([q.to_dict() for q in session.questions()], wire_format)  # 返回完整题目数据
         })
     except ValueError as e:
         logger.error(f'抽取题目参数错误: {str(e)}')
@@ -261,26 +652,123 @@ def extract_questions():
         logger.error(f'抽取题目失败: {str(e)}')
         return jsonify({'success': False, 'message': f'抽取失败: {str(e)}'}), 500
 
+@app.route('/api/search', methods=['GET'])
+def search_questions():
+    """全文搜索当前题库的题干、选项和解析，返回按相关度排序的分页结果"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'message': '搜索关键词不能为空'}), 400
+    
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'success': False, 'message': '页码和每页数量必须是整数'}), 400
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        return jsonify({'success': False, 'message': f'页码必须大于0，每页数量必须在1到{MAX_PAGE_SIZE}之间'}), 400
+    
+    try:
+        snapshot = safe_manager.snapshot
+        result = safe_manager.search_questions(query, page, page_size, snapshot)
+        return jsonify({
+            'success': True,
+            'total': result.total,
+            'page': page,
+            'page_size': page_size,
+            'results': [
+                {'index': index, 'score': score, 'question': snapshot.questions[index].to_dict()}
+                for index, score in result.hits
+            ]
+        })
+    except Exception as e:
+        logger.error(f'搜索题目失败: {str(e)}')
+        return jsonify({'success': False, 'message': f'搜索失败: {str(e)}'}), 500
+
+# 按窗口获取题目时每次最多返回的题数
+MAX_QUESTION_WINDOW = 100
+
+def answer_sheet_skeleton(session):
+    """答题卡骨架：题号列表，以及题型字符串表加每道题的题型编号"""
+    types = []
+    type_codes = {}
+    codes = []
+    ids = []
+    for index in range(len(session)):
+        question = session.question(index)
+        q_type = question.get('type', '')
+        code = type_codes.get(q_type)
+        if code is None:
+            code = type_codes[q_type] = len(types)
+            types.append(q_type)
+        codes.append(code)
+        ids.append(question.get('id', index + 1))
+    return {'ids': ids, 'types': types, 'type_codes': codes}
+
+def question_body(session, index):
+    """试卷中一道题的题面，查看过答案后才附带正确答案和解析"""
+    question = session.question(index)
+    is_answer_viewed = session.is_viewed(index)
+    body = {
+        'id': question.get('id', index + 1),
+        'type': question.get('type', ''),
+        'content': question.get('content', ''),
+        'options': question.get('options', []),
+        'analysis': question.get('analysis', '') if is_answer_viewed else ''
+    }
+    if is_answer_viewed:
+        body['correct_answer'] = question.get('correct_answer', [])
+    return body
+
+@app.route('/api/questions', methods=['GET'])
+def get_question_window():
+    """按窗口获取试卷中从start开始的count道题（如接下来的20题），用于前端按需加载和预取"""
+    session = current_session()
+    if session is None:
+        return no_session_response()
+    
+    try:
+        start = int(request.args.get('start', 0))
+        count = int(request.args.get('count', 20))
+    except ValueError:
+        return jsonify({'success': False, 'message': '起始位置和题数必须是整数'}), 400
+    if start < 0 or not 1 <= count <= MAX_QUESTION_WINDOW:
+        return jsonify({'success': False, 'message': f'起始位置不能为负数，题数必须在1到{MAX_QUESTION_WINDOW}之间'}), 400
+    wire_format = request.args.get('format', 'json')
+    if wire_format not in WIRE_FORMATS:
+        return jsonify({'success': False, 'message': f'不支持的传输格式: {wire_format}'}), 400
+    
+    try:
+        end = min(start + count, len(session))
+        return jsonify({
+            'success': True,
+            'start': start,
+            'total': len(session),
+            'format': wire_format,
+            'questions': encode_questions([question_body(session, i) for i in range(start, end)], wire_format),
+            'user_answers': [session.get_answer(i) for i in range(start, end)],
+            'viewed': [session.is_viewed(i) for i in range(start, end)]
+        })
+    except Exception as e:
+        logger.error(f'获取题目失败: {str(e)}')
+        return jsonify({'success': False, 'message': f'获取题目失败: {str(e)}'}), 500
+
 @app.route('/api/questions/<int:index>', methods=['GET'])
 def get_question(index):
     """获取指定索引的题目"""
+    session = current_session()
+    if session is None:
+        return no_session_response()
+    
     try:
-        if 0 <= index < len(question_manager['selected_questions']):
-            question = question_manager['selected_questions'][index]
-            user_answer = question_manager['user_answers'].get(index, [])
-            is_answer_viewed = question_manager['viewed_answers'].get(index, False)
+        if session.has_question(index):
+            question = question_body(session, index)
+            question.pop('correct_answer', None)
             
             return jsonify({
                 'success': True,
-                'question': {
-                    'id': question.get('id', index + 1),
-                    'type': question.get('type', ''),
-                    'content': question.get('content', ''),
-                    'options': question.get('options', []),
-                    'analysis': question.get('analysis', '') if is_answer_viewed else ''
-                },
-                'user_answer': user_answer,
-                'is_answer_viewed': is_answer_viewed
+                'question': question,
+                'user_answer': session.get_answer(index),
+                'is_answer_viewed': session.is_viewed(index)
             })
         else:
             logger.error(f'题目索引无效: {index}')
@@ -294,10 +782,13 @@ def save_answer(index):
     """保存用户答案"""
     data = request.get_json()
     answer = data.get('answer', [])
+    session = current_session()
+    if session is None:
+        return no_session_response()
     
     try:
-        if 0 <= index < len(question_manager['selected_questions']):
-            question_manager['user_answers'][index] = answer
+        if session.has_question(index):
+            session.set_answer(index, answer)
             return jsonify({'success': True, 'message': '答案保存成功'})
         else:
             logger.error(f'题目索引无效: {index}')
@@ -306,55 +797,90 @@ def save_answer(index):
         logger.error(f'保存答案失败: {str(e)}')
         return jsonify({'success': False, 'message': f'保存答案失败: {str(e)}'}), 500
 
+# 批量保存作答时一次最多提交的题数
+MAX_ANSWER_BATCH = 1000
+
+
+@app.route('/api/answers', methods=['POST'])
+def save_answers():
+    """批量保存用户答案
+    
+    请求体为 {"answers": {"题目序号": 答案, ...}, "version": 版本号, "paper_id": 试卷编号}，
+    试卷编号由抽题接口返回，版本号在每份试卷内递增。试卷编号不是当前试卷时（上一份试卷迟到的请求）返回409，
+    版本号不大于已保存的版本时（重复或迟到的请求）忽略本次请求，响应中返回服务器当前的版本号。
+    """
+    data = request.get_json(silent=True) or {}
+    answers = data.get('answers')
+    version = data.get('version')
+    paper_id = data.get('paper_id')
+    if not isinstance(answers, dict) or not all(
+            isinstance(value, int) and not isinstance(value, bool) for value in (version, paper_id)):
+        return jsonify({'success': False, 'message': '请求体必须包含answers对象、整数version和整数paper_id'}), 400
+    if len(answers) > MAX_ANSWER_BATCH:
+        return jsonify({'success': False, 'message': f'一次最多保存{MAX_ANSWER_BATCH}道题的答案'}), 400
+    session = current_session()
+    if session is None:
+        return no_session_response()
+    if paper_id != session.paper_id:
+        return jsonify({'success': False, 'message': '答案所属的试卷已被新抽取的试卷替换',
+                        'paper_id': session.paper_id}), 409
+    
+    try:
+        parsed = {}
+        for key, answer in answers.items():
+            try:
+                index = int(key)
+            except ValueError:
+                index = -1
+            if not session.has_question(index) or not isinstance(answer, list):
+                logger.error(f'批量保存答案失败，题目索引或答案无效: {key}')
+                return jsonify({'success': False, 'message': f'题目索引或答案无效: {key}'}), 400
+            parsed[index] = answer
+        applied = session.apply_answers(parsed, version, paper_id)
+        return jsonify({
+            'success': True,
+            'applied': applied,
+            'version': session.answers_version,
+            'saved': len(parsed) if applied else 0
+        })
+    except Exception as e:
+        logger.error(f'保存答案失败: {str(e)}')
+        return jsonify({'success': False, 'message': f'保存答案失败: {str(e)}'}), 500
+
 @app.route('/api/submit', methods=['POST'])
 def submit_exam():
     """提交考试，计算成绩并返回错题信息"""
+    session = current_session()
+    if session is None:
+        return no_session_response()
+    
     try:
-        total_questions = len(question_manager['selected_questions'])
-        correct_count = 0
-        wrong_questions = []
-        
-        for i in range(total_questions):
-            question = question_manager['selected_questions'][i]
-            user_answer = question_manager['user_answers'].get(i, [])
-            correct_answer = question['correct_answer']
-            
-            # 根据题型检查答案是否正确
-            is_correct = False
-            if question['type'] in ['单选题', '判断题', '多选题', '选择题']:
-                is_correct = set(user_answer) == set(correct_answer)
-            elif question['type'] in ['填空题', '简答题', '释义题']:
-                if len(user_answer) == len(correct_answer):
-                    is_all_correct = True
-                    for ua, ca in zip(user_answer, correct_answer):
-                        if ua.strip() != ca.strip():
-                            is_all_correct = False
-                            break
-                    is_correct = is_all_correct
-            
-            if is_correct:
-                correct_count += 1
-            else:
-                # 收集错题信息
-                wrong_question = {
-                    'id': i + 1,
-                    'type': question['type'],
-                    'content': question['content'],
-                    'options': question.get('options', []),
-                    'user_answer': user_answer,
-                    'correct_answer': correct_answer,
-                    'analysis': question.get('analysis', '')
-                }
-                wrong_questions.append(wrong_question)
+        selected_questions = session.questions()
+        user_answers = session.answers
+        result = grade_session(selected_questions, user_answers)
+        # 同一份试卷的错题只计入做题记录一次（之后生成错题本时不会重复计入）
+        safe_manager.record_wrong_answers(
+            selected_questions[i] for i in session.claim_wrong(result.wrong_indices))
         
-        # 计算得分（满分100）
-        score = round((correct_count / total_questions) * 100, 1) if total_questions > 0 else 0
+        # 收集错题信息
+        wrong_questions = []
+        for i in result.wrong_indices:
+            question = selected_questions[i]
+            wrong_questions.append({
+                'id': i + 1,
+                'type': question['type'],
+                'content': question['content'],
+                'options': question.get('options', []),
+                'user_answer': session.get_answer(i),
+                'correct_answer': question['correct_answer'],
+                'analysis': question.get('analysis', '')
+            })
         
         return jsonify({
             'success': True,
-            'score': score,
-            'correct_count': correct_count,
-            'total_questions': total_questions,
+            'score': result.score,
+            'correct_count': result.correct_count,
+            'total_questions': result.total_questions,
             'wrong_questions': wrong_questions
         })
     except Exception as e:
@@ -364,10 +890,14 @@ def submit_exam():
 @app.route('/api/questions/<int:index>/view_answer', methods=['POST'])
 def view_answer(index):
     """查看答案"""
+    session = current_session()
+    if session is None:
+        return no_session_response()
+    
     try:
-        if 0 <= index < len(question_manager['selected_questions']):
-            question_manager['viewed_answers'][index] = True
-            question = question_manager['selected_questions'][index]
+        if session.has_question(index):
+            session.mark_viewed(index)
+            question = session.question(index)
             
             return jsonify({
                 'success': True,
@@ -428,8 +958,6 @@ def save_wrong_questions():
             if not file_name.endswith('.json'):
                 file_name += '.json'
         
-        file_path = os.path.join(WRONG_QUESTIONS_DIR, file_name)
-        
         # 准备错题本数据
         wrong_book = {
             'title': data.get('title', '错题本'),
@@ -438,9 +966,8 @@ def save_wrong_questions():
             'questions': wrong_questions
         }
         
-        # 保存到文件
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(wrong_book, f, ensure_ascii=False, indent=2)
+        # 保存到文件并更新错题本索引
+        file_path = write_wrong_book(file_name, wrong_book)
         
         logger.info(f'错题本保存成功: {file_path}')
         return jsonify({
@@ -469,6 +996,10 @@ def generate_wrong_book():
         if not wrong_indices:
             return jsonify({'success': False, 'message': '没有错题序号可以处理'}), 400
         
+        session = current_session()
+        if session is None:
+            return no_session_response()
+        
         # 确保错题本目录存在
         if not os.path.exists(WRONG_QUESTIONS_DIR):
             try:
@@ -483,8 +1014,8 @@ def generate_wrong_book():
         for index in wrong_indices:
             # 转换为0-based索引
             question_index = index - 1
-            if 0 <= question_index < len(question_manager['selected_questions']):
-                question = question_manager['selected_questions'][question_index]
+            if session.has_question(question_index):
+                question = session.question(question_index)
                 user_answer = user_answers.get(str(index), [])
                 wrong_question = {
                     'id': index,
@@ -497,11 +1028,13 @@ def generate_wrong_book():
                 }
                 wrong_questions.append(wrong_question)
         
+        # 记录答错的题目，用于按答错次数加权抽题；提交时已计入的错题不再重复计入
+        safe_manager.record_wrong_answers(
+            session.question(i) for i in session.claim_wrong(q['id'] - 1 for q in wrong_questions))
+        
         # 生成时间戳文件名
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         file_name = f'错题本_{timestamp}.json'
-        file_path = os.path.join(WRONG_QUESTIONS_DIR, file_name)
-        
         # 准备错题本数据
         wrong_book = {
             'title': '错题本',
@@ -510,9 +1043,8 @@ def generate_wrong_book():
             'questions': wrong_questions
         }
         
-        # 保存到文件
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(wrong_book, f, ensure_ascii=False, indent=2)
+        # 保存到文件并更新错题本索引
+        file_path = write_wrong_book(file_name, wrong_book)
         
         logger.info(f'错题本生成成功: {file_path}')
         return jsonify({
@@ -531,25 +1063,9 @@ def get_available_wrong_books():
     try:
         books = []
         if os.path.exists(WRONG_QUESTIONS_DIR):
-            for filename in os.listdir(WRONG_QUESTIONS_DIR):
-                if filename.endswith('.json'):
-                    file_path = os.path.join(WRONG_QUESTIONS_DIR, filename)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            books.append({
-                                'file_name': filename,
-                                'title': data.get('title', '错题本'),
-                                'total_questions': data.get('total_questions', 0),
-                                'generated_at': data.get('generated_at', 0),
-                                'file_size': os.path.getsize(file_path)
-                            })
-                    except Exception as e:
-                        logger.error(f'读取错题本 {filename} 失败: {str(e)}')
-                        continue
-        
-        # 按生成时间倒序排序
-        books.sort(key=lambda x: x['generated_at'], reverse=True)
+            # 按生成时间倒序排序，只有新增或被修改的错题本才会重新解析
+            books = wrong_book_catalog.list_books(
+                on_error=lambda filename, e: logger.error(f'读取错题本 {filename} 失败: {str(e)}'))
         
         return jsonify({
             'success': True,
@@ -559,10 +1075,20 @@ def get_available_wrong_books():
         logger.error(f'获取错题本列表失败: {str(e)}')
         return jsonify({'success': False, 'message': f'获取错题本列表失败: {str(e)}'}), 500
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus格式的运行指标"""
+    if not METRICS_ENABLED:
+        return jsonify({'success': False, 'message': '运行指标已关闭'}), 404
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/')
 def index():
-    """返回前端页面"""
-    return send_from_directory(app.static_folder, 'index.html')
+    """返回前端页面（其中的资源地址已改写为带哈希的地址）"""
+    response = asset_response(ENTRY_PAGE)
+    if response is None:
+        return send_from_directory(STATIC_DIR, ENTRY_PAGE)
+    return response
 
 if __name__ == '__main__':
     # 确保web目录存在
@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import atexit
+import random
+import threading
+from collections import OrderedDict
+
+# 做题记录文件（放在隐藏目录中，避免被当作题库文件列出）
+HISTORY_FILE = os.path.join('.history', 'question_history.json')
+
+# 支持的加权抽题方式
+WEIGHT_MODES = ('wrong', 'stale', 'tags')
+
+# 每答错一次增加的权重
+WRONG_WEIGHT = 2.0
+# 按未见天数加权时的最大天数，从未见过的题目按此值计算
+STALE_MAX_DAYS = 30
+# 权重下限，保证每道题都有机会被抽中
+MIN_WEIGHT = 1e-6
+
+# 做题记录变化后延迟多久（秒）由后台线程写入文件，期间的多次变化合并为一次写入
+SAVE_DELAY = 5.0
+
+# 做题记录最多保留的最近变化数，超出后较早的变化被丢弃，落后太多的权重缓存整体重建
+MAX_CHANGE_LOG = 100000
+# 按未练习时长加权时，缓存的权重最多使用多久（秒）后整体重新计算（权重按天计，这段时间内的变化可以忽略）
+STALE_REFRESH_SECONDS = 3600
+# 最多缓存权重树状数组的题型下标数组个数，超出时淘汰最久未使用的
+MAX_CACHED_BUCKETS = 16
+# 每个题型下标数组最多缓存几组不同标签权重的树状数组
+MAX_TAG_CONFIGS = 4
+
+
+class FenwickSampler:
+    """基于树状数组（Fenwick树）的加权无放回抽样
+    
+    构建为O(n)，每次抽取并移除一个元素为O(log n)，抽取k个元素共O(k log n)。
+    """
+    
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.weights = [max(float(w), MIN_WEIGHT) for w in weights]
+        self.remaining = self.size
+        
+        # O(n)构建树状数组
+        tree = [0.0] + self.weights
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self.tree = tree
+        
+        self.top_bit = 1
+        while self.top_bit * 2 <= self.size:
+            self.top_bit *= 2
+    
+    def total(self):
+        """剩余元素的权重之和"""
+        i = self.size
+        result = 0.0
+        while i > 0:
+            result += self.tree[i]
+            i -= i & -i
+        return result
+    
+    def _add(self, index, delta):
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+    
+    def _find(self, target):
+        """查找前缀和首次超过target的位置"""
+        pos = 0
+        bit = self.top_bit
+        while bit:
+            next_pos = pos + bit
+            if next_pos <= self.size and self.tree[next_pos] <= target:
+                pos = next_pos
+                target -= self.tree[next_pos]
+            bit >>= 1
+        return pos
+    
+    def set_weight(self, index, weight):
+        """修改一个未被移除的元素的权重，O(log n)"""
+        weight = max(float(weight), MIN_WEIGHT)
+        self._add(index, weight - self.weights[index])
+        self.weights[index] = weight
+    
+    def draw(self, rng=random):
+        """按权重抽取一个元素下标并将其移除"""
+        return self._draw(rng)[0]
+    
+    def _draw(self, rng):
+        if self.remaining <= 0:
+            raise ValueError("没有可抽取的元素")
+        index = self._find(rng.random() * self.total())
+        # 浮点误差可能落到已移除的元素或越界，此时向前后寻找最近的剩余元素
+        if index >= self.size or self.weights[index] == 0.0:
+            index = self._nearest_remaining(min(index, self.size - 1))
+        weight = self.weights[index]
+        self._add(index, -weight)
+        self.weights[index] = 0.0
+        self.remaining -= 1
+        return index, weight
+    
+    def _nearest_remaining(self, index):
+        for offset in range(self.size):
+            for candidate in (index - offset, index + offset):
+                if 0 <= candidate < self.size and self.weights[candidate] > 0.0:
+                    return candidate
+        raise ValueError("没有可抽取的元素")
+    
+    def sample(self, k, rng=random, keep=False):
+        """无放回地按权重抽取k个元素下标，keep为True时抽取后恢复被抽中元素的权重，以便复用同一棵树"""
+        drawn = [self._draw(rng) for _ in range(min(k, self.remaining))]
+        if keep:
+            for index, weight in drawn:
+                self._add(index, weight)
+                self.weights[index] = weight
+            self.remaining += len(drawn)
+        return [index for index, _ in drawn]
+
+
+class QuestionHistory:
+    """做题记录：按题目指纹记录答错次数和最近一次被抽到的时间
+    
+    记录只在内存中修改，变化后由后台线程延迟save_delay秒写入文件（程序退出时写入尚未保存的变化），
+    抽题和判分不会因重写整个记录文件而阻塞；save_delay为None时只在调用flush或save时写入。
+    """
+    
+    def __init__(self, file_path=HISTORY_FILE, save_delay=SAVE_DELAY):
+        self.file_path = file_path
+        self.save_delay = save_delay
+        self.records = {}
+        self.lock = threading.Lock()
+        # 串行化写入，避免较早的内容覆盖较新的内容
+        self.save_lock = threading.Lock()
+        self.dirty = False
+        self._timer = None
+        # 最近变化过的指纹（按变化顺序），changes_base为changes[0]在全部变化中的序号
+        self.changes = []
+        self.changes_base = 0
+        self._load()
+        if save_delay is not None:
+            atexit.register(self.flush)
+    
+    def _load(self):
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                self.records = json.load(f)
+        except FileNotFoundError:
+            self.records = {}
+        except Exception as e:
+            print(f"读取做题记录失败: {e}")
+            self.records = {}
+    
+    def save(self):
+        """保存做题记录，先写临时文件再原子替换"""
+        with self.save_lock:
+            with self.lock:
+                data = json.dumps(self.records, ensure_ascii=False)
+                self.dirty = False
+            try:
+                directory = os.path.dirname(self.file_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # 临时文件名区分进程和线程，多个线程同时保存时不会写坏同一个临时文件
+                tmp_path = f'{self.file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.file_path)
+            except Exception as e:
+                print(f"保存做题记录失败: {e}")
+    
+    def flush(self):
+        """立即写入尚未保存的变化，没有变化时不写文件"""
+        with self.lock:
+            if not self.dirty:
+                return
+        self.save()
+    
+    def change_count(self):
+        """迄今为止的变化总数，即changes_since使用的当前位置"""
+        with self.lock:
+            return self.changes_base + len(self.changes)
+    
+    def changes_since(self, position):
+        """返回自position以来变化过的指纹和新的位置；较早的变化已被丢弃时返回(None, 新位置)"""
+        with self.lock:
+            end = self.changes_base + len(self.changes)
+            if position < self.changes_base:
+                return None, end
+            return self.changes[position - self.changes_base:], end
+    
+    def _changed(self, fingerprints):
+        """记录变化过的指纹，标记记录已变化并安排一次延迟写入（调用方需持有lock）"""
+        self.changes.extend(fingerprints)
+        if len(self.changes) > MAX_CHANGE_LOG:
+            dropped = len(self.changes) - MAX_CHANGE_LOG // 2
+            del self.changes[:dropped]
+            self.changes_base += dropped
+        self.dirty = True
+        if self.save_delay is None or self._timer is not None:
+            return
+        self._timer = threading.Timer(self.save_delay, self._save_later)
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def _save_later(self):
+        with self.lock:
+            self._timer = None
+        self.flush()
+    
+    def get(self, fingerprint):
+        """返回(答错次数, 最近一次被抽到的时间戳)，没有记录时返回(0, None)"""
+        record = self.records.get(fingerprint)
+        if record is None:
+            return 0, None
+        return record[0], record[1]
+    
+    def record_seen(self, fingerprints, now=None):
+        now = now if now is not None else time.time()
+        fingerprints = list(fingerprints)
+        with self.lock:
+            for fingerprint in fingerprints:
+                record = self.records.setdefault(fingerprint, [0, None])
+                record[1] = now
+            self._changed(fingerprints)
+    
+    def record_wrong(self, fingerprints):
+        fingerprints = list(fingerprints)
+        with self.lock:
+            for fingerprint in fingerprints:
+                record = self.records.setdefault(fingerprint, [0, None])
+                record[0] += 1
+            self._changed(fingerprints)
+
+
+def question_tags(question):
+    """题目的标签：章节标题以及题库中自带的tags字段"""
+    tags = []
+    title = question.get('title')
+    if title:
+        tags.append(title)
+    extra_tags = question.get('tags')
+    if isinstance(extra_tags, list):
+        tags.extend(extra_tags)
+    elif isinstance(extra_tags, str):
+        tags.append(extra_tags)
+    return tags
+
+
+def make_weight_fn(mode, history=None, tag_weights=None, fingerprint_fn=None, now=None):
+    """根据抽题方式生成权重函数
+    
+    wrong: 按历史答错次数加权；stale: 按距上次被抽到的天数加权；
+    tags: 按用户给定的标签权重加权（标签为章节标题或题目的tags字段）。
+    """
+    if mode not in WEIGHT_MODES:
+        raise ValueError(f"不支持的抽题方式: {mode}")
+    
+    if mode == 'tags':
+        tag_weights = tag_weights or {}
+        
+        def weight(question):
+            matched = [tag_weights[tag] for tag in question_tags(question) if tag in tag_weights]
+            return max(matched) if matched else 1.0
+        return weight
+    
+    if history is None or fingerprint_fn is None:
+        raise ValueError("按做题记录加权时需要提供做题记录")
+    now = now if now is not None else time.time()
+    
+    if mode == 'wrong':
+        def weight(question):
+            wrong_count, _ = history.get(fingerprint_fn(question))
+            return 1.0 + WRONG_WEIGHT * wrong_count
+        return weight
+    
+    def weight(question):
+        _, last_seen = history.get(fingerprint_fn(question))
+        if last_seen is None:
+            return 1.0 + STALE_MAX_DAYS
+        days = max(0.0, (now - last_seen) / 86400.0)
+        return 1.0 + min(days, STALE_MAX_DAYS)
+    return weight
+
+
+
+class _BucketWeights:
+    """一个题型下标数组的权重缓存：指纹 -> 在下标数组中的位置，以及各抽题方式的权重树状数组"""
+    
+    __slots__ = ('questions', 'bucket', 'positions', 'samplers', 'lock')
+    
+    def __init__(self, questions, bucket):
+        self.questions = questions
+        self.bucket = bucket
+        self.positions = None
+        # (抽题方式, 标签权重) -> [树状数组, 做题记录, 已同步到的变化位置, 计算权重的时间]
+        self.samplers = {}
+        self.lock = threading.Lock()
+
+
+class WeightedSamplerCache:
+    """缓存各题型下标数组的权重树状数组，加权抽题时复用，抽取k道题为O(k log n)
+    
+    某种抽题方式第一次用于某个题型时计算一次全部权重（O(n)），之后只更新做题记录中发生变化的题目；
+    按未练习时长加权时每隔STALE_REFRESH_SECONDS整体重新计算一次。按标签加权时按标签权重分别缓存。
+    """
+    
+    def __init__(self, max_buckets=MAX_CACHED_BUCKETS):
+        self.max_buckets = max_buckets
+        self.entries = OrderedDict()  # id(下标数组) -> _BucketWeights
+        self.lock = threading.Lock()
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def sampler(self, mode, history=None, tag_weights=None, fingerprint_fn=None):
+        """返回按mode加权的抽样函数sample(questions, bucket, k, rng)，供sample_indices_by_type使用"""
+        # 提前检查参数，与make_weight_fn的报错一致
+        make_weight_fn(mode, history, tag_weights, fingerprint_fn)
+        tag_key = tuple(sorted((tag_weights or {}).items())) if mode == 'tags' else None
+        
+        def sample(questions, bucket, k, rng=random):
+            entry = self._entry(questions, bucket)
+            with entry.lock:
+                tree = self._tree(entry, mode, tag_key, history, tag_weights, fingerprint_fn)
+                return [bucket[j] for j in tree.sample(k, rng, keep=True)]
+        return sample
+    
+    def _entry(self, questions, bucket):
+        key = id(bucket)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.bucket is not bucket or entry.questions is not questions:
+                entry = self.entries[key] = _BucketWeights(questions, bucket)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_buckets:
+                self.entries.popitem(last=False)
+            return entry
+    
+    def _tree(self, entry, mode, tag_key, history, tag_weights, fingerprint_fn):
+        """取得最新的权重树状数组（调用方需持有entry.lock）"""
+        questions, bucket = entry.questions, entry.bucket
+        state = entry.samplers.get((mode, tag_key))
+        
+        if mode == 'tags':
+            if state is None:
+                tag_keys = [key for key in entry.samplers if key[0] == 'tags']
+                if len(tag_keys) >= MAX_TAG_CONFIGS:
+                    del entry.samplers[tag_keys[0]]
+                weight = make_weight_fn(mode, tag_weights=tag_weights)
+                state = entry.samplers[(mode, tag_key)] = [FenwickSampler([weight(questions[i]) for i in bucket])]
+            return state[0]
+        
+        now = time.time()
+        if state is not None and state[1] is history:
+            changed, position = history.changes_since(state[2])
+        else:
+            changed, position = None, history.change_count()
+        if changed is None or \
+                (mode == 'stale' and now - state[3] > STALE_REFRESH_SECONDS):
+            weight = make_weight_fn(mode, history, fingerprint_fn=fingerprint_fn, now=now)
+            tree = FenwickSampler([weight(questions[i]) for i in bucket])
+            entry.samplers[(mode, tag_key)] = [tree, history, position, now]
+            return tree
+        
+        if changed:
+            if entry.positions is None:
+                positions = {}
+                for j, i in enumerate(bucket):
+                    positions.setdefault(fingerprint_fn(questions[i]), []).append(j)
+                entry.positions = positions
+            weight = make_weight_fn(mode, history, fingerprint_fn=fingerprint_fn, now=now)
+            for fingerprint in set(changed):
+                for j in entry.positions.get(fingerprint, ()):
+                    state[0].set_weight(j, weight(questions[bucket[j]]))
+        state[2] = position
+        return state[0]
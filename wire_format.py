@@ -0,0 +1,96 @@
+"""
+题目列表的紧凑传输格式（按列编码）
+
+同一批题目中的题型、章节标题、"正确"/"错误"等选项文本大量重复。按列编码时，
+所有重复出现的字符串只在共享字符串表中出现一次，各字段用编号数组表示：
+
+    {
+        "format": "columnar",
+        "count": 题目数,
+        "strings": [共享字符串表],
+        "columns": [
+            {"name": "type", "kind": "table", "values": [0, 0, 1, ...]},
+            {"name": "options", "kind": "table_list", "values": [[2, 3], null, ...]},
+            {"name": "content", "kind": "raw", "values": ["...", ...]}
+        ]
+    }
+
+kind为table时值为字符串表编号，table_list时为编号列表，raw时为原始JSON值；
+null表示该题没有这个字段。web/app.js中的decodeQuestions是对应的解码器。
+"""
+
+COLUMNAR = 'columnar'
+WIRE_FORMATS = ('json', COLUMNAR)
+
+# 字符串字段中不同取值占比低于该值时才使用字符串表（题干等几乎不重复的字段直接保留原文）
+_TABLE_RATIO = 0.5
+
+
+def _column_kind(values):
+    """根据字段的取值决定编码方式"""
+    present = [value for value in values if value is not None]
+    if not present:
+        return 'raw'
+    if all(isinstance(value, list) and all(isinstance(item, str) for item in value) for value in present):
+        return 'table_list'
+    if all(isinstance(value, str) for value in present):
+        if len(set(present)) <= len(present) * _TABLE_RATIO:
+            return 'table'
+    return 'raw'
+
+
+def encode_columnar(records):
+    """将dict列表按列编码，重复的字符串放入共享字符串表"""
+    names = []
+    seen = set()
+    for record in records:
+        for name in record:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+    
+    strings = []
+    codes = {}
+    
+    def code_of(text):
+        code = codes.get(text)
+        if code is None:
+            code = codes[text] = len(strings)
+            strings.append(text)
+        return code
+    
+    columns = []
+    for name in names:
+        values = [record.get(name) for record in records]
+        kind = _column_kind(values)
+        if kind == 'table':
+            values = [None if value is None else code_of(value) for value in values]
+        elif kind == 'table_list':
+            values = [None if value is None else [code_of(item) for item in value] for value in values]
+        columns.append({'name': name, 'kind': kind, 'values': values})
+    
+    return {'format': COLUMNAR, 'count': len(records), 'strings': strings, 'columns': columns}
+
+
+def decode_columnar(payload):
+    """encode_columnar的逆过程，用于校验和测试"""
+    strings = payload['strings']
+    records = [{} for _ in range(payload['count'])]
+    for column in payload['columns']:
+        name, kind = column['name'], column['kind']
+        for record, value in zip(records, column['values']):
+            if value is None:
+                continue
+            if kind == 'table':
+                value = strings[value]
+            elif kind == 'table_list':
+                value = [strings[code] for code in value]
+            record[name] = value
+    return records
+
+
+def encode_questions(questions, wire_format='json'):
+    """按请求的传输格式编码题目dict列表，默认原样返回"""
+    if wire_format == COLUMNAR:
+        return encode_columnar(questions)
+    return questions
@@ -0,0 +1,101 @@
+import os
+import json
+import threading
+
+# 目录索引文件名（隐藏文件，不会出现在错题本列表中）
+CATALOG_FILE = '.catalog.json'
+
+
+def _book_meta(book, stat):
+    """错题本列表中显示的信息，以及用于判断文件是否变化的(大小, 修改时间)"""
+    return {
+        'title': book.get('title', '错题本'),
+        'total_questions': book.get('total_questions', 0),
+        'generated_at': book.get('generated_at', 0),
+        'file_size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns
+    }
+
+
+class WrongBookCatalog:
+    """错题本目录的索引：文件名 -> 标题、题数、生成时间和文件大小
+    
+    写入错题本时同步更新索引，列出错题本时只需列目录并比较文件的大小和修改时间，
+    只有在磁盘上新增或被修改的文件才会重新解析，已删除的文件从索引中移除。
+    """
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self.catalog_path = os.path.join(directory, CATALOG_FILE)
+        self.lock = threading.Lock()
+        self.entries = None  # 首次使用时从索引文件读取
+    
+    def _load(self):
+        if self.entries is not None:
+            return
+        try:
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            self.entries = entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            self.entries = {}
+    
+    def _save(self):
+        tmp_path = f'{self.catalog_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.catalog_path)
+    
+    def write(self, file_name, book):
+        """保存错题本并更新索引，返回文件路径"""
+        file_path = os.path.join(self.directory, file_name)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(book, f, ensure_ascii=False, indent=2)
+        with self.lock:
+            self._load()
+            self.entries[file_name] = _book_meta(book, os.stat(file_path))
+            self._save()
+        return file_path
+    
+    def list_books(self, on_error=None):
+        """列出全部错题本（按生成时间倒序），只解析索引中没有或已变化的文件"""
+        with self.lock:
+            self._load()
+            changed = False
+            present = set()
+            for entry in os.scandir(self.directory):
+                name = entry.name
+                if name.startswith('.') or not name.endswith('.json') or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                meta = self.entries.get(name)
+                if meta is None or meta['file_size'] != stat.st_size or meta['mtime_ns'] != stat.st_mtime_ns:
+                    try:
+                        with open(entry.path, 'r', encoding='utf-8') as f:
+                            meta = _book_meta(json.load(f), stat)
+                    except Exception as e:
+                        if on_error:
+                            on_error(name, e)
+                        continue
+                    self.entries[name] = meta
+                    changed = True
+                present.add(name)
+            
+            for name in [name for name in self.entries if name not in present]:
+                del self.entries[name]
+                changed = True
+            if changed:
+                self._save()
+            
+            books = [
+                {
+                    'file_name': name,
+                    'title': meta['title'],
+                    'total_questions': meta['total_questions'],
+                    'generated_at': meta['generated_at'],
+                    'file_size': meta['file_size']
+                }
+                for name, meta in self.entries.items()
+            ]
+        books.sort(key=lambda x: x['generated_at'], reverse=True)
+        return books